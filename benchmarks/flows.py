@@ -0,0 +1,186 @@
+"""Benchmark memory and allocations of traffic flows.
+
+Run from the repository root with `python benchmarks/flows.py`.
+"""
+
+import time
+import tracemalloc
+
+from beartype import beartype
+
+from traffic_sim.core.distance import euclidean
+from traffic_sim.core.flow.flow import TrafficFlow
+from traffic_sim.matrix import TrafficMatrix
+
+NUM_FLOWS = 100_000
+SIZE = 500
+EPOCHS = 3
+
+# small grid where flows complete quickly and are replaced
+CHURN_SIZE = 40
+CHURN_EPOCHS = 200
+
+
+class DictFlow(object):
+    """The flow before slotting, with a possible_moves dict per step."""
+
+    def __init__(self, location: tuple, dest: tuple, volume: int):
+        """Initialize a flow.
+
+        Args:
+            location (tuple): (row, col) of the current location.
+            dest (tuple): (row, col) of the destination.
+            volume (int): The volume of the flow.
+        """
+        self.location = location
+        self.dest = dest
+        self.volume = volume
+        self.renew_moves()
+
+    def renew_moves(self) -> None:
+        """Rebuild the dict of possible moves."""
+        row, col = self.location
+        self.possible_moves = {
+            (row + diff_i, col + diff_j): euclidean(
+                (row + diff_i, col + diff_j), self.dest,
+            )
+            for diff_i, diff_j in ((-1, 0), (0, 0), (1, 0), (0, -1), (0, 1))
+        }
+
+    @beartype
+    def moves_list(self) -> list[tuple]:
+        """Return a list of possible moves.
+
+        Returns:
+            List[tuple]: List of possible moves.
+        """
+        return list(self.possible_moves.keys())
+
+    @beartype
+    def unset_move(self, move: tuple) -> None:
+        """Remove a possible move.
+
+        Args:
+            move (tuple): (row, col) of the move to remove.
+        """
+        self.possible_moves.pop(move)
+
+    def step(self) -> None:
+        """Move to the cheapest possible move."""
+        self.prev = self.location
+        if self.possible_moves:
+            self.location = min(
+                self.possible_moves, key=self.possible_moves.get,
+            )
+
+
+def flow_memory(flow_cls: type) -> float:
+    """Return the traced bytes per live flow.
+
+    Args:
+        flow_cls (type): Flow class to construct.
+
+    Returns:
+        float: Bytes per flow.
+    """
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    flows = [
+        flow_cls((idx % SIZE, idx // SIZE), (0, 0), 1)
+        for idx in range(NUM_FLOWS)
+    ]
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del flows
+    return used / NUM_FLOWS
+
+
+def flow_steps(flow_cls: type) -> float:
+    """Step live flows the way TrafficMatrix.step_flows does.
+
+    Args:
+        flow_cls (type): Flow class to step.
+
+    Returns:
+        float: Seconds per epoch.
+    """
+    flows = [
+        flow_cls((idx % SIZE, idx // SIZE), (SIZE - 1, SIZE - 1), 1)
+        for idx in range(NUM_FLOWS)
+    ]
+    begin = time.perf_counter()
+    for _ in range(EPOCHS):
+        for flow in flows:
+            flow.renew_moves()
+            for move in flow.moves_list():
+                if not (0 <= move[0] < SIZE and 0 <= move[1] < SIZE):
+                    flow.unset_move(move)
+            flow.step()
+    return (time.perf_counter() - begin) / EPOCHS
+
+
+def churn(recycle: bool, size: int, density: float, epochs: int) -> tuple:
+    """Step a matrix and count the flows constructed.
+
+    Args:
+        recycle (bool): Reuse completed flows.
+        size (int): Number of rows and columns.
+        density (float): Traffic density.
+        epochs (int): Number of epochs to measure.
+
+    Returns:
+        tuple: Flows constructed, peak traced bytes and seconds per epoch.
+    """
+    tm = TrafficMatrix(size, size, density=density, seed=1)
+    tm.cmatrix[:] = 4
+    tm.recycle = recycle
+    tm.step()
+
+    created = 0
+    init = TrafficFlow.__init__
+
+    def counted(flow, *args, **kwargs):
+        nonlocal created
+        created += 1
+        init(flow, *args, **kwargs)
+
+    TrafficFlow.__init__ = counted
+    tracemalloc.start()
+    begin = time.perf_counter()
+    for _ in range(epochs):
+        tm.step()
+    elapsed = (time.perf_counter() - begin) / epochs
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    TrafficFlow.__init__ = init
+    return created, peak, elapsed
+
+
+def main():
+    """Print the benchmark results."""
+    for label, flow_cls in (('before', DictFlow), ('after', TrafficFlow)):
+        print(
+            '{0}: {1:.0f} bytes per flow, {2:.3f} s/epoch'.format(
+                label, flow_memory(flow_cls), flow_steps(flow_cls),
+            ),
+        )
+    scenarios = (
+        ('live', SIZE, NUM_FLOWS / SIZE ** 2, EPOCHS),
+        ('churn', CHURN_SIZE, 0.5, CHURN_EPOCHS),
+    )
+    for name, size, density, epochs in scenarios:
+        for recycle in (False, True):
+            created, peak, elapsed = churn(recycle, size, density, epochs)
+            print(
+                '{0} recycle={1}: {2} flows constructed, '.format(
+                    name, recycle, created,
+                ),
+                'peak {0:.1f} MiB, {1:.3f} s/epoch'.format(
+                    peak / 2 ** 20, elapsed,
+                ),
+                sep='',
+            )
+
+
+if __name__ == '__main__':
+    main()
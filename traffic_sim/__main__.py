@@ -1,29 +1,127 @@
 """Traffic simulator code."""
 
+import argparse
 import sys
 from os import path
 
-from traffic_sim.analysis import TrafficExperiment
+from traffic_sim.analysis import TrafficExperiment, TrialQueue, work
 from traffic_sim.console import console
+from traffic_sim.core.telemetry import make_telemetry
 
 if not __package__:
     _path = path.realpath(path.abspath(__file__))
     sys.path.insert(0, path.dirname(path.dirname(_path)))
 
 
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    """Parse CLI arguments.
+
+    Args:
+        argv (List[str]): Arguments without the program name.
+
+    Returns:
+        argparse.Namespace: Parsed arguments.
+    """
+    parser = argparse.ArgumentParser(prog='traffic')
+    parser.add_argument('--experiments', type=int, default=100)
+    parser.add_argument('--trials', type=int, default=30)
+    parser.add_argument('--rows', type=int, default=10)
+    parser.add_argument('--cols', type=int, default=10)
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0, help='root seed')
+    parser.add_argument(
+        'command',
+        nargs='?',
+        default='run',
+        choices=('run', 'enqueue', 'work', 'merge'),
+        help='run locally, or enqueue/work/merge a sweep in a queue',
+    )
+    parser.add_argument('queue', nargs='?', help='path of the queue database')
+    parser.add_argument(
+        '--metrics',
+        action='store_true',
+        help='record and export travel time, throughput and blocked moves',
+    )
+    parser.add_argument(
+        '--lease',
+        type=float,
+        default=600.0,
+        help='seconds a worker may hold a trial',
+    )
+    parser.add_argument(
+        '--arrow',
+        action='store_true',
+        help='also write the results as Feather (Arrow IPC) files',
+    )
+    parser.add_argument(
+        '--log',
+        help='write progress and trial results as JSON lines to this file',
+    )
+    parser.add_argument(
+        '--verbosity',
+        type=int,
+        choices=(0, 1, 2),
+        help='0 quiet, 1 progress, 2 every trial',
+    )
+    args = parser.parse_args(argv)
+    if args.command != 'run' and args.queue is None:
+        parser.error('{0} needs a queue path'.format(args.command))
+    if args.metrics and args.command != 'run':
+        # queued trials only store one result per variant
+        parser.error('--metrics is only supported by run')
+    return args
+
+
+def run_queue(args: argparse.Namespace, ex: TrafficExperiment) -> None:
+    """Enqueue, work or merge a sweep in a queue.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments.
+        ex (TrafficExperiment): Experiment merged results are analyzed by.
+    """
+    queue = TrialQueue(args.queue, lease=args.lease)
+    if args.command == 'enqueue':
+        grid = (args.rows, args.cols, args.epochs)
+        added = queue.enqueue(args.experiments, args.trials, grid, args.seed)
+        console.log('Enqueued {0} trials'.format(added))
+    elif args.command == 'work':
+        done = work(queue, telemetry=ex.telemetry)
+        console.log('Completed {0} trials'.format(done))
+    else:
+        remaining = queue.remaining()
+        if remaining:
+            console.log('{0} trials have no result yet'.format(remaining))
+            sys.exit(1)
+        ex.stats = queue.stats()
+        if args.arrow:
+            ex.export()
+        ex.analyze()
+
+
 def main():
     """Run code from CLI."""
+    args = parse_args(sys.argv[1:])
     console.log('traffic sim')
-    num_trials = 30
     ex = TrafficExperiment(
-        experiments=100,
-        trials=num_trials,
-        rows=10,
-        cols=10,
-        epochs=10,
+        experiments=args.experiments,
+        trials=args.trials,
+        rows=args.rows,
+        cols=args.cols,
+        epochs=args.epochs,
+        seed=args.seed,
     )
-    ex.run()
-    ex.analyze()
+    if args.command in {'run', 'work'}:
+        ex.telemetry = make_telemetry(args.log, args.verbosity)
+    if args.command == 'run':
+        if args.metrics:
+            ex.enable_metrics()
+        ex.run()
+        if args.arrow:
+            ex.export()
+        ex.analyze()
+        return
+
+    run_queue(args, ex)
 
 
 if __name__ == '__main__':
@@ -1,3 +1,5 @@
 """Expose core.sim module."""
 
 from traffic_sim.core.analysis.experiment import TrafficExperiment
+from traffic_sim.core.analysis.stats import ExperimentStats, RunningStats
+from traffic_sim.core.analysis.workqueue import TrialQueue, work
@@ -1,23 +1,34 @@
 """Module for running experimental results."""
 
-from copy import deepcopy
+from functools import lru_cache
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
-import pandas as pd
 import seaborn as sns
 from beartype import beartype
 from matplotlib import pyplot as plt
 
-from traffic_sim.console import console
+from traffic_sim.core.analysis.stats import ExperimentStats
+from traffic_sim.core.export import save_frame
+from traffic_sim.core.metrics import TrafficMetrics
+from traffic_sim.core.rand import Seed, child_seed
 from traffic_sim.core.sim.history import TrafficHistory
-from traffic_sim.matrix import TrafficMatrix, WeightedMatrix
+from traffic_sim.core.sim.stream import FullCellsCounter, full_cells
+from traffic_sim.core.telemetry import VERBOSE, RichTelemetry, Telemetry
+from traffic_sim.matrix import RoadLayout, TrafficMatrix, WeightedMatrix
 from traffic_sim.sim import TrafficSim
 
 base_path = Path.cwd() / 'output'
 if not base_path.exists():
     base_path.mkdir(parents=True, exist_ok=True)
 
+# matrix class of each result column
+VARIANTS = {
+    'full_cells': TrafficMatrix,
+    'full_cells_w': WeightedMatrix,
+}
+
 
 @beartype
 def num_full_cells(cmatrix: np.ndarray, th: TrafficHistory) -> int:
@@ -30,11 +41,86 @@ def num_full_cells(cmatrix: np.ndarray, th: TrafficHistory) -> int:
     Returns:
         int: Number of full cells in the history.
     """
-    counts = 0
-    for vmatrix in th.volume_history:
-        idxs = np.where(vmatrix > 0)
-        counts += np.count_nonzero(cmatrix[idxs] == vmatrix[idxs])
-    return counts
+    return sum(full_cells(cmatrix, vmatrix) for vmatrix in th.volume_history)
+
+
+@lru_cache(maxsize=None)
+@beartype
+def experiment_layout(rows: int, cols: int) -> RoadLayout:
+    """Return the road layout with the experiment capacities.
+
+    Layouts are built once per grid size and reused by every trial.
+
+    Args:
+        rows (int): Number of rows in the capacity matrix.
+        cols (int): Number of columns in the capacity matrix.
+
+    Returns:
+        RoadLayout: Read-only road layout.
+    """
+    cmatrix = np.zeros((rows, cols), dtype=int)
+    cmatrix[:, 2] = 2
+    cmatrix[:, 8] = 2
+    cmatrix[3, :] = 3
+    cmatrix[:, 5] = 4
+    return RoadLayout(cmatrix)
+
+
+@beartype
+def build_matrix(
+    variant: str,
+    rows: int,
+    cols: int,
+    density: float,
+    seed: Seed = None,
+) -> TrafficMatrix:
+    """Build the traffic matrix of a variant with the experiment capacities.
+
+    Args:
+        variant (str): Result column of the variant, a key of VARIANTS.
+        rows (int): Number of rows in the capacity matrix.
+        cols (int): Number of columns in the capacity matrix.
+        density (float): Density of the traffic matrix.
+        seed (Seed): Random seed of the matrix.
+
+    Returns:
+        TrafficMatrix: Traffic matrix ready to simulate.
+    """
+    tm = VARIANTS[variant](rows, cols, density=density, seed=seed)
+    tm.use_layout(experiment_layout(rows, cols))
+    return tm
+
+
+@beartype
+def run_variant(
+    variant: str,
+    density: float,
+    seed: Seed,
+    grid: tuple[int, int, int],
+    metrics: Optional[TrafficMetrics] = None,
+) -> int:
+    """Simulate one variant and count its full cells.
+
+    Args:
+        variant (str): Result column of the variant, a key of VARIANTS.
+        density (float): Density of the traffic matrix.
+        seed (Seed): Random seed of the trial, each variant gets its own
+            stream below it.
+        grid (tuple): (rows, cols, epochs) of the simulation.
+        metrics (TrafficMetrics): Metrics to record KPIs into, if any.
+
+    Returns:
+        int: Number of full cells over all epochs.
+    """
+    rows, cols, epochs = grid
+    variant_seed = child_seed(seed, list(VARIANTS).index(variant))
+    tm = build_matrix(variant, rows, cols, density, variant_seed)
+    tm.metrics = metrics
+
+    # count full cells as epochs arrive instead of keeping the history
+    counter = FullCellsCounter(tm.cmatrix)
+    TrafficSim(tm).stream(epochs, [counter])
+    return counter.count
 
 
 class TrafficExperiment(object):
@@ -47,6 +133,7 @@ class TrafficExperiment(object):
         rows: int,
         cols: int,
         epochs: int,
+        seed: Seed = 0,
     ) -> None:
         """Initialize the ExperimentRunner.
 
@@ -56,71 +143,80 @@ class TrafficExperiment(object):
             rows: Number of rows in the capacity matrix.
             cols: Number of columns in the capacity matrix.
             epochs: Number of epochs to run.
+            seed: Root seed, every experiment and trial gets its own
+                stream below it.
         """
         self.experiments = experiments
         self.trials = trials
         self.rows = rows
         self.cols = cols
         self.epochs = epochs
-        self.res_df = pd.DataFrame(
-            columns=[
-                'density',
-                'full_cells',
-                'full_cells_w',
-            ],
-        )
+        self.seed = seed
+        self.stats = ExperimentStats(list(VARIANTS))
+        self.metrics = None
+        # progress and trial results, e.g. JsonTelemetry for a log file
+        self.telemetry: Telemetry = RichTelemetry()
+
+    def enable_metrics(self) -> None:
+        """Record KPIs of every variant across all trials."""
+        self.metrics = {variant: TrafficMetrics() for variant in VARIANTS}
 
     def run(self) -> None:
         """Run experiments."""
-        for experiment in range(self.experiments):
-            console.log('Experiment {0}'.format(experiment))
-            for trial in range(self.trials):
-                console.log('Trial {0}'.format(trial))
-                density = trial / 100
-                self.run_trial(density)
+        telemetry = self.telemetry
+        telemetry.start(self.experiments * self.trials)
+        try:
+            for experiment in range(self.experiments):
+                for trial in range(self.trials):
+                    density = trial / 100
+                    seed = child_seed(self.seed, experiment, trial)
+                    self.run_trial(density, seed)
+                if telemetry.enabled(VERBOSE):
+                    telemetry.log(
+                        'experiment',
+                        experiment=experiment,
+                        means=self.stats.means().to_dict(),
+                    )
+        finally:
+            telemetry.close()
 
     @beartype
-    def run_trial(self, density: float) -> None:
+    def run_trial(self, density: float, seed: Seed = None) -> None:
         """Run a single trial.
 
         Args:
             density: Density of the traffic matrix.
+            seed: Random seed of the traffic matrices.
         """
-        tm = TrafficMatrix(self.rows, self.cols, density=density)
-        tm.cmatrix[:, 2] = 2
-        tm.cmatrix[:, 8] = 2
-        tm.cmatrix[3, :] = 3
-        tm.cmatrix[:, 5] = 4
-
-        wtm = WeightedMatrix(self.rows, self.cols, density=density)
-        wtm.cmatrix = deepcopy(tm.cmatrix)
-        wtm.set_weights()
-
-        sim = TrafficSim(tm)
-        sim.run(self.epochs)
-
-        wsim = TrafficSim(wtm)
-        wsim.run(self.epochs)
-
-        num_full = num_full_cells(tm.cmatrix, sim.history)
-        num_full_w = num_full_cells(wtm.cmatrix, wsim.history)
-
-        self.res_df = self.res_df.append(
-            {
-                'density': density,
-                'full_cells': num_full,
-                'full_cells_w': num_full_w,
-            },
-            ignore_index=True,
-        )
-        console.log('Density: {0}'.format(density))
-        console.log('Full cells: {0}'.format(num_full))
-        console.log('Full cells (w): {0}'.format(num_full_w))
+        grid = (self.rows, self.cols, self.epochs)
+        results = {
+            variant: run_variant(
+                variant, density, seed, grid, self.variant_metrics(variant),
+            )
+            for variant in VARIANTS
+        }
+        self.stats.add(density, results)
+        self.telemetry.log('trial', density=density, **results)
+        self.telemetry.advance()
+
+    @beartype
+    def variant_metrics(self, variant: str) -> Optional[TrafficMetrics]:
+        """Return the metrics of a variant, None when disabled.
+
+        Args:
+            variant: Result column of the variant.
+
+        Returns:
+            Metrics of the variant or None.
+        """
+        if self.metrics is None:
+            return None
+        return self.metrics[variant]
 
     def analyze(self) -> None:
         """Analyze the results."""
         # get average full cells per density
-        avg_full_cells = self.res_df.groupby('density').mean()
+        avg_full_cells = self.stats.means()
 
         # save csv
         avg_full_cells.to_csv(base_path / 'avg_full_cells.csv')
@@ -128,6 +224,12 @@ class TrafficExperiment(object):
         # save latex
         avg_full_cells.to_latex(base_path / 'avg_full_cells.tex')
 
+        # save metrics
+        if self.metrics is not None:
+            for variant, metrics in self.metrics.items():
+                path = base_path / 'metrics_{0}.csv'.format(variant)
+                metrics.to_frame().to_csv(path, index=False)
+
         # create graph
         x1 = avg_full_cells.index.values
         y1 = avg_full_cells['full_cells'].values
@@ -139,3 +241,14 @@ class TrafficExperiment(object):
         plt.ylabel('Number of full cells')
         plt.legend()
         plt.savefig(base_path / 'avg_full_cells.png')
+
+    def export(self) -> None:
+        """Write the results as Feather files for memory-mapped reading."""
+        save_frame(
+            str(base_path / 'avg_full_cells.feather'), self.stats.means(),
+        )
+        save_frame(str(base_path / 'summary.feather'), self.stats.summary())
+        if self.metrics is not None:
+            for variant, metrics in self.metrics.items():
+                path = base_path / 'metrics_{0}.feather'.format(variant)
+                save_frame(str(path), metrics.to_frame())
@@ -0,0 +1,242 @@
+"""Module for aggregating experimental results online."""
+
+import math
+from typing import Union
+
+import pandas as pd
+from beartype import beartype
+
+
+class QuantileSketch(object):
+    """Mergeable streaming quantile sketch.
+
+    Values are kept in levels where an item at level h stands for 2 ** h
+    values. A level holding `size` items is sorted and every other item is
+    promoted to the next level, so memory stays O(size * log(n)).
+    """
+
+    size: int
+    levels: list[list[float]]
+
+    @beartype
+    def __init__(self, size: int = 128) -> None:
+        """Initialize quantile sketch.
+
+        Args:
+            size (int): Number of items per level before compacting.
+        """
+        self.size = size
+        self.levels = [[]]
+        self._offset = 0
+
+    @beartype
+    def add(self, value: Union[int, float]) -> None:
+        """Add a value to the sketch.
+
+        Args:
+            value (Union[int, float]): Value to add.
+        """
+        self.levels[0].append(float(value))
+        self.compact()
+
+    def compact(self) -> None:
+        """Promote every other item of full levels to the next level."""
+        for height, level in enumerate(self.levels):
+            if len(level) < self.size:
+                continue
+            if height + 1 == len(self.levels):
+                self.levels.append([])
+            level.sort()
+            self.levels[height + 1].extend(level[self._offset::2])
+            self.levels[height] = []
+            # alternate the kept half so compacting isn't biased
+            self._offset = 1 - self._offset
+
+    @beartype
+    def merge(self, other: 'QuantileSketch') -> None:
+        """Merge another sketch into this one.
+
+        Args:
+            other (QuantileSketch): Sketch to merge.
+        """
+        for height, level in enumerate(other.levels):
+            if height == len(self.levels):
+                self.levels.append([])
+            self.levels[height].extend(level)
+        self.compact()
+
+    @beartype
+    def quantile(self, q: float) -> float:
+        """Return an estimate of the q-th quantile.
+
+        Args:
+            q (float): Quantile between 0 and 1.
+
+        Returns:
+            float: Estimated quantile, nan when the sketch is empty.
+        """
+        items = sorted(
+            (value, 2 ** height)
+            for height, level in enumerate(self.levels)
+            for value in level
+        )
+        if not items:
+            return math.nan
+        total = sum(weight for _, weight in items)
+        seen = 0
+        for value, weight in items:
+            seen += weight
+            if seen >= q * total:
+                return value
+        return items[-1][0]
+
+
+class RunningStats(object):
+    """Online count, mean, variance, min, max and quantiles of a value."""
+
+    count: int
+    mean: float
+    minimum: float
+    maximum: float
+    sketch: QuantileSketch
+
+    def __init__(self) -> None:
+        """Initialize running statistics."""
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.sketch = QuantileSketch()
+
+    @beartype
+    def add(self, value: Union[int, float]) -> None:
+        """Add a value using Welford's algorithm.
+
+        Args:
+            value (Union[int, float]): Value to add.
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        self.sketch.add(value)
+
+    @beartype
+    def merge(self, other: 'RunningStats') -> None:
+        """Merge statistics computed on another set of values.
+
+        Args:
+            other (RunningStats): Statistics to merge.
+        """
+        count = self.count + other.count
+        if not count:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def variance(self) -> float:
+        """Return the sample variance.
+
+        Returns:
+            float: Sample variance, nan with less than two values.
+        """
+        if self.count < 2:
+            return math.nan
+        return self._m2 / (self.count - 1)
+
+
+class ExperimentStats(object):
+    """Running statistics of each result column per density."""
+
+    columns: list[str]
+    stats: dict[float, dict[str, RunningStats]]
+
+    @beartype
+    def __init__(self, columns: list[str]) -> None:
+        """Initialize experiment statistics.
+
+        Args:
+            columns (List[str]): Names of the result columns.
+        """
+        self.columns = columns
+        self.stats = {}
+
+    @beartype
+    def add(self, density: float, results: dict[str, int]) -> None:
+        """Add the results of one trial.
+
+        Args:
+            density (float): Density of the trial.
+            results (Dict[str, int]): Value of each result column.
+        """
+        if density not in self.stats:
+            self.stats[density] = {
+                column: RunningStats() for column in self.columns
+            }
+        for column, value in results.items():
+            self.stats[density][column].add(value)
+
+    @beartype
+    def merge(self, other: 'ExperimentStats') -> None:
+        """Merge statistics collected by another worker.
+
+        Args:
+            other (ExperimentStats): Statistics to merge.
+        """
+        for density, columns in other.stats.items():
+            if density not in self.stats:
+                self.stats[density] = {
+                    column: RunningStats() for column in self.columns
+                }
+            for column, stats in columns.items():
+                self.stats[density][column].merge(stats)
+
+    def means(self) -> pd.DataFrame:
+        """Return the mean of each column per density.
+
+        Returns:
+            pd.DataFrame: Means indexed by density.
+        """
+        densities = sorted(self.stats)
+        means = {
+            column: [self.stats[density][column].mean for density in densities]
+            for column in self.columns
+        }
+        return pd.DataFrame(means, index=pd.Index(densities, name='density'))
+
+    @beartype
+    def summary(self, quantiles: tuple = (0.5, 0.9)) -> pd.DataFrame:
+        """Return all statistics of each column per density.
+
+        Args:
+            quantiles (tuple): Quantiles to estimate.
+
+        Returns:
+            pd.DataFrame: Statistics indexed by density and column.
+        """
+        rows = []
+        for density in sorted(self.stats):
+            for column in self.columns:
+                stats = self.stats[density][column]
+                row = {
+                    'density': density,
+                    'column': column,
+                    'count': stats.count,
+                    'mean': stats.mean,
+                    'var': stats.variance,
+                    'min': stats.minimum,
+                    'max': stats.maximum,
+                }
+                for q in quantiles:
+                    row['q{0}'.format(q)] = stats.sketch.quantile(q)
+                rows.append(row)
+        return pd.DataFrame(rows).set_index(['density', 'column'])
@@ -0,0 +1,325 @@
+"""Module for running experiment sweeps from a durable work queue."""
+
+import os
+import socket
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Optional
+
+from beartype import beartype
+
+from traffic_sim.core.analysis.experiment import VARIANTS, run_variant
+from traffic_sim.core.analysis.stats import ExperimentStats
+from traffic_sim.core.rand import child_seed
+from traffic_sim.core.telemetry import PROGRESS, Telemetry
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    id INTEGER PRIMARY KEY,
+    experiment INTEGER NOT NULL,
+    trial INTEGER NOT NULL,
+    variant TEXT NOT NULL,
+    density REAL NOT NULL,
+    seed INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    cols INTEGER NOT NULL,
+    epochs INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    result INTEGER,
+    UNIQUE (experiment, trial, variant)
+);
+CREATE INDEX IF NOT EXISTS trials_status ON trials (status, lease_until);
+"""
+
+
+def worker_name() -> str:
+    """Return a name identifying this worker process.
+
+    Returns:
+        str: Host name and process id.
+    """
+    return '{0}:{1}'.format(socket.gethostname(), os.getpid())
+
+
+class TrialQueue(object):
+    """Work queue of trials stored in a SQLite database.
+
+    The database can live on a shared directory, so workers on any node
+    claim trials from it. A claimed trial is leased for `lease` seconds;
+    trials of crashed workers are claimed again once their lease expires.
+    """
+
+    path: Path
+    lease: float
+
+    @beartype
+    def __init__(self, path: str, lease: float = 600.0) -> None:
+        """Initialize the queue, creating the database if needed.
+
+        Args:
+            path (str): Path of the SQLite database.
+            lease (float): Seconds a worker may hold a trial.
+        """
+        self.path = Path(path)
+        self.lease = lease
+        with closing(self.connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection that waits on locks held by other workers.
+
+        Returns:
+            sqlite3.Connection: Connection in autocommit mode.
+        """
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    @beartype
+    def enqueue(
+        self,
+        experiments: int,
+        trials: int,
+        grid: tuple[int, int, int],
+        seed: int = 0,
+    ) -> int:
+        """Write the trial specs of a sweep, skipping existing ones.
+
+        Trial densities and seeds follow TrafficExperiment.run, so a sweep
+        gives the same results however its trials are split up. Enqueuing
+        a sweep again adds only its missing trials.
+
+        Args:
+            experiments (int): Number of experiments to run.
+            trials (int): Number of trials per experiment.
+            grid (tuple): (rows, cols, epochs) of each simulation.
+            seed (int): Root seed of the sweep.
+
+        Returns:
+            int: Number of trial specs added.
+
+        Raises:
+            ValueError: If the queue holds trials of the sweep with another
+                density, seed or grid.
+        """
+        specs = [
+            (
+                experiment,
+                trial,
+                variant,
+                trial / 100,
+                seed,
+                *grid,
+            )
+            for experiment in range(experiments)
+            for trial in range(trials)
+            for variant in VARIANTS
+        ]
+        with closing(self.connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conflicts = self.conflicts(conn, experiments, trials, grid, seed)
+            if conflicts:
+                conn.execute('ROLLBACK')
+                raise ValueError(
+                    '{0} queued trials differ from the sweep, use another '
+                    'queue'.format(conflicts),
+                )
+            cursor = conn.executemany(
+                'INSERT OR IGNORE INTO trials (experiment, trial, variant, '
+                'density, seed, rows, cols, epochs) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                specs,
+            )
+            conn.execute('COMMIT')
+        return cursor.rowcount
+
+    def conflicts(
+        self,
+        conn: sqlite3.Connection,
+        experiments: int,
+        trials: int,
+        grid: tuple[int, int, int],
+        seed: int,
+    ) -> int:
+        """Count the queued trials of a sweep with another spec.
+
+        Args:
+            conn (sqlite3.Connection): Connection in a transaction.
+            experiments (int): Number of experiments of the sweep.
+            trials (int): Number of trials per experiment.
+            grid (tuple): (rows, cols, epochs) of each simulation.
+            seed (int): Root seed of the sweep.
+
+        Returns:
+            int: Number of conflicting trials.
+        """
+        row = conn.execute(
+            'SELECT COUNT(*) FROM trials WHERE experiment < ? AND trial < ? '
+            'AND variant IN ({0}) AND (density != trial / 100.0 '
+            'OR seed != ? OR rows != ? OR cols != ? OR epochs != ?)'.format(
+                ', '.join('?' * len(VARIANTS)),
+            ),
+            (experiments, trials, *VARIANTS, seed, *grid),
+        ).fetchone()
+        return row[0]
+
+    @beartype
+    def claim(self, worker: str) -> Optional[dict]:
+        """Lease the next pending or expired trial.
+
+        Args:
+            worker (str): Name of the claiming worker.
+
+        Returns:
+            Optional[dict]: Spec of the claimed trial, None if there is none.
+        """
+        now = time.time()
+        with closing(self.connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                "SELECT * FROM trials WHERE status = 'pending' "
+                "OR (status = 'leased' AND lease_until < ?) "
+                'ORDER BY id LIMIT 1',
+                (now,),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE trials SET status = 'leased', worker = ?, "
+                    'lease_until = ? WHERE id = ?',
+                    (worker, now + self.lease, row['id']),
+                )
+            conn.execute('COMMIT')
+        return None if row is None else dict(row)
+
+    @beartype
+    def complete(self, trial_id: int, worker: str, result: int) -> bool:
+        """Store the result of a trial leased by a worker.
+
+        Args:
+            trial_id (int): Id of the trial.
+            worker (str): Name of the worker holding the lease.
+            result (int): Result of the trial.
+
+        Returns:
+            bool: False if the lease was lost to another worker.
+        """
+        with closing(self.connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE trials SET status = 'done', result = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (result, trial_id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def remaining(self) -> int:
+        """Return the number of trials without a result.
+
+        Returns:
+            int: Number of pending or leased trials.
+        """
+        with closing(self.connect()) as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM trials WHERE status != 'done'",
+            ).fetchone()
+        return row[0]
+
+    def stats(self) -> ExperimentStats:
+        """Merge the results of completed trials.
+
+        Returns:
+            ExperimentStats: Statistics of every completed trial.
+        """
+        stats = ExperimentStats(list(VARIANTS))
+        with closing(self.connect()) as conn:
+            rows = conn.execute(
+                'SELECT density, variant, result FROM trials '
+                "WHERE status = 'done' ORDER BY id",
+            )
+            for density, variant, result in rows:
+                stats.add(density, {variant: result})
+        return stats
+
+
+@beartype
+def work(
+    queue: TrialQueue,
+    poll: float = 1.0,
+    telemetry: Optional[Telemetry] = None,
+) -> int:
+    """Run trials from the queue until every trial has a result.
+
+    While other workers hold the remaining trials, the worker polls so it
+    can take over trials whose lease expires.
+
+    Args:
+        queue (TrialQueue): Queue to claim trials from.
+        poll (float): Seconds to wait between claims when idle.
+        telemetry (Optional[Telemetry]): Telemetry of this worker, e.g.
+            JsonTelemetry appending to a log shared by all workers.
+
+    Returns:
+        int: Number of trials completed by this worker.
+    """
+    if telemetry is None:
+        telemetry = Telemetry()
+    worker = worker_name()
+    # other workers share the queue, so this worker's total is unknown
+    telemetry.start()
+    try:
+        return work_trials(queue, poll, telemetry, worker)
+    finally:
+        telemetry.close()
+
+
+def work_trials(
+    queue: TrialQueue,
+    poll: float,
+    telemetry: Telemetry,
+    worker: str,
+) -> int:
+    """Run trials from the queue as a worker, see work.
+
+    Args:
+        queue (TrialQueue): Queue to claim trials from.
+        poll (float): Seconds to wait between claims when idle.
+        telemetry (Telemetry): Telemetry of this worker.
+        worker (str): Name of the worker.
+
+    Returns:
+        int: Number of trials completed by this worker.
+    """
+    done = 0
+    while True:
+        spec = queue.claim(worker)
+        if spec is None:
+            if not queue.remaining():
+                return done
+            time.sleep(poll)
+            continue
+        result = run_variant(
+            spec['variant'],
+            spec['density'],
+            child_seed(spec['seed'], spec['experiment'], spec['trial']),
+            (spec['rows'], spec['cols'], spec['epochs']),
+        )
+        if queue.complete(spec['id'], worker, result):
+            done += 1
+            telemetry.log(
+                'trial',
+                worker=worker,
+                trial_id=spec['id'],
+                variant=spec['variant'],
+                density=spec['density'],
+                result=result,
+            )
+            telemetry.advance()
+        else:
+            telemetry.log(
+                'lost_lease',
+                level=PROGRESS,
+                worker=worker,
+                trial_id=spec['id'],
+            )
@@ -0,0 +1,198 @@
+"""Demand module for replaying recorded origin-destination traffic."""
+
+import threading
+from pathlib import Path
+from queue import Queue
+
+import numpy as np
+from beartype import beartype
+
+DEMAND_DTYPE = np.dtype([
+    ('epoch', np.int32),
+    ('origin_row', np.int32),
+    ('origin_col', np.int32),
+    ('dest_row', np.int32),
+    ('dest_col', np.int32),
+    ('volume', np.int32),
+])
+
+
+@beartype
+def demand_records(
+    epochs: np.ndarray,
+    origins: np.ndarray,
+    dests: np.ndarray,
+    volumes: np.ndarray,
+) -> np.ndarray:
+    """Build a demand table from columns.
+
+    Args:
+        epochs (np.ndarray): Epoch of each injection.
+        origins (np.ndarray): (n, 2) array of (row, col) origins.
+        dests (np.ndarray): (n, 2) array of (row, col) destinations.
+        volumes (np.ndarray): Volume of each injection.
+
+    Returns:
+        np.ndarray: Structured array of DEMAND_DTYPE records.
+    """
+    records = np.empty(len(epochs), dtype=DEMAND_DTYPE)
+    records['epoch'] = epochs
+    records['origin_row'] = origins[:, 0]
+    records['origin_col'] = origins[:, 1]
+    records['dest_row'] = dests[:, 0]
+    records['dest_col'] = dests[:, 1]
+    records['volume'] = volumes
+    return records
+
+
+@beartype
+def record_flows(records: np.ndarray) -> list[tuple]:
+    """Return the origin, destination and volume of each demand record.
+
+    Args:
+        records (np.ndarray): Structured array of DEMAND_DTYPE records.
+
+    Returns:
+        List[tuple]: ((row, col), (row, col), volume) of each record.
+    """
+    origins = zip(
+        records['origin_row'].tolist(), records['origin_col'].tolist(),
+    )
+    dests = zip(records['dest_row'].tolist(), records['dest_col'].tolist())
+    return list(zip(origins, dests, records['volume'].tolist()))
+
+
+@beartype
+def save_demand(path: str, records: np.ndarray) -> None:
+    """Save a demand table to a .npy file, sorted by epoch.
+
+    Args:
+        path (str): Path of the file to write to.
+        records (np.ndarray): Structured array of DEMAND_DTYPE records.
+    """
+    order = np.argsort(records['epoch'], kind='stable')
+    np.save(path, records[order].astype(DEMAND_DTYPE))
+
+
+class DemandSource(object):
+    """Stream a demand table from disk, one epoch at a time.
+
+    The file is memory mapped and read in chunks by a background thread
+    that stays up to `prefetch` chunks ahead, so tables larger than memory
+    can be replayed.
+    """
+
+    path: Path
+    chunk_size: int
+
+    @beartype
+    def __init__(
+        self,
+        path: str,
+        chunk_size: int = 1 << 16,
+        prefetch: int = 2,
+    ) -> None:
+        """Initialize demand source.
+
+        Args:
+            path (str): Path of a .npy file written by save_demand.
+            chunk_size (int): Number of records read at once.
+            prefetch (int): Number of chunks read ahead.
+        """
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self._records = np.load(self.path, mmap_mode='r')
+        self._chunks = Queue(maxsize=prefetch)
+        self._buffer = None
+        self._done = False
+        # error of the reader, raised again by pop
+        self._error = None
+        self._stop = threading.Event()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def __len__(self) -> int:
+        """Return the number of records in the table.
+
+        Returns:
+            int: Number of records.
+        """
+        return len(self._records)
+
+    def _read(self) -> None:
+        """Read chunks into the queue until the table is exhausted.
+
+        An error while reading is put in the queue in place of a chunk.
+        """
+        try:
+            for start in range(0, len(self._records), self.chunk_size):
+                if self._stop.is_set():
+                    return
+                chunk = np.array(self._records[start:start + self.chunk_size])
+                self._chunks.put(chunk)
+        except Exception as err:
+            self._chunks.put(err)
+            return
+        self._chunks.put(None)
+
+    def _next_chunk(self):
+        """Return the next chunk, or None once the table is exhausted.
+
+        Returns:
+            Next chunk of records or None.
+
+        Raises:
+            Exception: The error of the reader, if reading failed.
+        """
+        if self._error is not None:
+            raise self._error
+        if self._done:
+            return None
+        chunk = self._chunks.get()
+        if isinstance(chunk, Exception):
+            self._error = chunk
+            raise chunk
+        self._done = chunk is None
+        return chunk
+
+    @beartype
+    def pop(self, epoch: int) -> np.ndarray:
+        """Return the records of an epoch, dropping any earlier records.
+
+        Args:
+            epoch (int): Epoch to return the records of.
+
+        Returns:
+            np.ndarray: Structured array of DEMAND_DTYPE records.
+
+        Raises:
+            Exception: The error of the reader, if reading failed.
+        """
+        parts = []
+        while True:
+            if self._buffer is None:
+                self._buffer = self._next_chunk()
+                if self._buffer is None:
+                    break
+            epochs = self._buffer['epoch']
+            low = np.searchsorted(epochs, epoch, side='left')
+            high = np.searchsorted(epochs, epoch, side='right')
+            parts.append(self._buffer[low:high])
+            if high < len(self._buffer):
+                self._buffer = self._buffer[high:]
+                break
+            self._buffer = None
+        if not parts:
+            return np.empty(0, dtype=DEMAND_DTYPE)
+        return np.concatenate(parts)
+
+    def close(self) -> None:
+        """Stop the background reader."""
+        self._stop.set()
+        while self._reader.is_alive():
+            # unblock the reader if it waits on a full queue
+            while not self._chunks.empty():
+                self._chunks.get_nowait()
+            self._reader.join(timeout=0.01)
+        self._done = True
+        self._buffer = None
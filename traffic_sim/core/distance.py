@@ -37,3 +37,16 @@ def euclidean(p1: tuple[int, int], p2: tuple[int, int]) -> int:
     diff_x = p1[0] - p2[0]
     diff_y = p1[1] - p2[1]
     return (diff_x ** 2 + diff_y ** 2) ** 0.5
+
+
+def manhattan(p1: tuple[int, int], p2: tuple[int, int]) -> int:
+    """Calculate the number of moves between two points.
+
+    Args:
+        p1: First point.
+        p2: Second point.
+
+    Returns:
+        The number of single row or column moves between the two points.
+    """
+    return abs(p1[0] - p2[0]) + abs(p1[1] - p2[1])
@@ -0,0 +1,310 @@
+"""Export module for writing runs and results as Arrow IPC (Feather) files.
+
+Files are written uncompressed, so they can be memory-mapped and read
+without copies. pyarrow is an optional dependency (the `arrow` extra) and
+is imported only when exporting.
+"""
+
+import json
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from beartype import beartype
+
+from traffic_sim.core.flow.flow import TrafficFlow
+from traffic_sim.core.sim.history import TrafficHistory
+from traffic_sim.core.sim.stream import EpochConsumer
+
+# integer columns of a flow snapshot, member columns are lists
+FLOW_COLUMNS = ('epoch', 'row', 'col', 'dest_row', 'dest_col', 'volume')
+MEMBER_COLUMNS = ('members', 'births')
+
+
+def import_pyarrow():
+    """Import pyarrow, which is only needed for Arrow export.
+
+    Returns:
+        module: The pyarrow module.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow  # noqa: WPS433
+        from pyarrow import feather, ipc  # noqa: F401, WPS433
+    except ImportError as err:
+        raise ImportError(
+            'Arrow export needs pyarrow, install the arrow extra with '
+            '`pip install traffic_sim[arrow]` or `poetry install -E arrow`.',
+        ) from err
+    return pyarrow
+
+
+@beartype
+def volume_schema(rows: int, cols: int):
+    """Return the schema of the volume frames of a matrix size.
+
+    Every epoch is one row, with its volume matrix flattened into a
+    fixed-size list. The matrix shape is stored in the field metadata.
+
+    Args:
+        rows (int): Number of rows of the matrix.
+        cols (int): Number of columns of the matrix.
+
+    Returns:
+        pyarrow.Schema: Columns epoch and volume.
+    """
+    pa = import_pyarrow()
+    return pa.schema([
+        pa.field('epoch', pa.int32(), nullable=False),
+        pa.field(
+            'volume',
+            pa.list_(pa.int64(), rows * cols),
+            nullable=False,
+            metadata={'shape': json.dumps([rows, cols])},
+        ),
+    ])
+
+
+def flow_schema():
+    """Return the schema of flow snapshots, one row per flow and epoch.
+
+    Returns:
+        pyarrow.Schema: Epoch, location, destination and volume of every
+        flow, with the volume and epoch of birth of each of its members.
+        Births are null unless the matrix records metrics.
+    """
+    pa = import_pyarrow()
+    return pa.schema(
+        [pa.field(name, pa.int32()) for name in FLOW_COLUMNS]
+        + [pa.field(name, pa.list_(pa.int32())) for name in MEMBER_COLUMNS],
+    )
+
+
+@beartype
+def member_births(flow: TrafficFlow) -> Optional[list[int]]:
+    """Return the epoch of birth of each member of a flow.
+
+    Args:
+        flow (TrafficFlow): Flow to get the births of.
+
+    Returns:
+        Optional[List[int]]: Epoch of birth per member, None if it isn't
+        tracked.
+    """
+    if flow.trips is None:
+        return None
+    return [born for born, _ in flow.trips]
+
+
+class ArrowWriter(EpochConsumer):
+    """Consumer that streams volume frames and flow snapshots to files.
+
+    Flows are copied into columns as each epoch is consumed, so the files
+    hold the state of every epoch even though flows change in place. Every
+    `batch_epochs` epochs the buffered columns are written as one record
+    batch, so memory stays bounded however long the run is.
+    """
+
+    volume_path: str
+    flow_path: Optional[str]
+    batch_epochs: int
+
+    @beartype
+    def __init__(
+        self,
+        volume_path: str,
+        flow_path: Optional[str] = None,
+        batch_epochs: int = 256,
+    ) -> None:
+        """Initialize Arrow writer.
+
+        Args:
+            volume_path (str): Path of the volume file.
+            flow_path (Optional[str]): Path of the flow file, None to skip
+                flows.
+            batch_epochs (int): Number of epochs per record batch.
+        """
+        self._pa = import_pyarrow()
+        self.volume_path = volume_path
+        self.flow_path = flow_path
+        self.batch_epochs = batch_epochs
+        # opened on the first epoch, once the matrix shape is known
+        self._volume_schema = None
+        self._volume_writer = None
+        self._flow_writer = None
+        if flow_path is not None:
+            self._flow_writer = self._pa.ipc.new_file(flow_path, flow_schema())
+        self._epochs = []
+        self._frames = []
+        self._flows = self._empty_flows()
+
+    def _empty_flows(self) -> dict:
+        """Return empty buffers of the flow columns.
+
+        Returns:
+            dict: Empty list per column.
+        """
+        return {name: [] for name in FLOW_COLUMNS + MEMBER_COLUMNS}
+
+    def consume(self, epoch, flows, volume):
+        """Buffer the epoch, writing a batch once enough are buffered.
+
+        Args:
+            epoch (int): Index of the epoch.
+            flows (List[TrafficFlow]): Traffic flows after the epoch.
+            volume (np.ndarray): Traffic volume matrix after the epoch.
+
+        Returns:
+            bool: Always False.
+        """
+        if self._volume_writer is None:
+            self._volume_schema = volume_schema(*volume.shape)
+            self._volume_writer = self._pa.ipc.new_file(
+                self.volume_path, self._volume_schema,
+            )
+        self._epochs.append(epoch)
+        self._frames.append(np.array(volume, dtype=np.int64))
+        if self._flow_writer is not None:
+            self.snapshot(epoch, flows)
+        if len(self._epochs) >= self.batch_epochs:
+            self.flush()
+        return False
+
+    @beartype
+    def snapshot(self, epoch: int, flows: list[TrafficFlow]) -> None:
+        """Copy the state of the flows of an epoch into the buffers.
+
+        Args:
+            epoch (int): Index of the epoch.
+            flows (List[TrafficFlow]): Traffic flows after the epoch.
+        """
+        columns = self._flows
+        for flow in flows:
+            columns['epoch'].append(epoch)
+            columns['row'].append(flow.location[0])
+            columns['col'].append(flow.location[1])
+            columns['dest_row'].append(flow.dest[0])
+            columns['dest_col'].append(flow.dest[1])
+            columns['volume'].append(flow.volume)
+            columns['members'].append(list(flow.members))
+            columns['births'].append(member_births(flow))
+
+    def flush(self) -> None:
+        """Write the buffered epochs as record batches."""
+        if not self._epochs:
+            return
+        pa = self._pa
+        schema = self._volume_schema
+        volume = pa.FixedSizeListArray.from_arrays(
+            pa.array(np.stack(self._frames).reshape(-1)),
+            schema.field('volume').type.list_size,
+        )
+        epochs = pa.array(self._epochs, type=pa.int32())
+        self._volume_writer.write_batch(
+            pa.record_batch([epochs, volume], schema=schema),
+        )
+        if self._flow_writer is not None:
+            self._flow_writer.write_batch(
+                pa.record_batch(self._flows, schema=flow_schema()),
+            )
+        self._epochs = []
+        self._frames = []
+        self._flows = self._empty_flows()
+
+    def close(self) -> None:
+        """Write the remaining epochs and close the files."""
+        self.flush()
+        for writer in (self._volume_writer, self._flow_writer):
+            if writer is not None:
+                writer.close()
+
+
+@beartype
+def save_history(
+    history: TrafficHistory,
+    volume_path: str,
+    batch_epochs: int = 256,
+) -> None:
+    """Write the volume frames of a history in record batches.
+
+    A history keeps its flows by reference, so it doesn't know where they
+    were in past epochs. To export flows, run the simulation with an
+    ArrowWriter.
+
+    Args:
+        history (TrafficHistory): History to export.
+        volume_path (str): Path of the volume file.
+        batch_epochs (int): Number of epochs per record batch.
+    """
+    writer = ArrowWriter(volume_path, batch_epochs=batch_epochs)
+    for epoch, volume in enumerate(history.volume_history):
+        writer.consume(epoch, [], volume)
+    writer.close()
+
+
+@beartype
+def save_table(path: str, table) -> None:
+    """Write an Arrow table to an uncompressed Feather (Arrow IPC) file.
+
+    Args:
+        path (str): Path of the file to write to.
+        table (pyarrow.Table): Table to write.
+    """
+    import_pyarrow().feather.write_feather(
+        table, path, compression='uncompressed',
+    )
+
+
+@beartype
+def load_table(path: str):
+    """Memory-map a Feather (Arrow IPC) file as a table without copying.
+
+    Args:
+        path (str): Path of the file to read.
+
+    Returns:
+        pyarrow.Table: Table backed by the mapped file, with one chunk per
+        record batch.
+    """
+    pa = import_pyarrow()
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def volume_frames(table) -> np.ndarray:
+    """Return the volume frames of a volume table as one array.
+
+    The frames of a single record batch are a view of the table, so they
+    are read from a memory-mapped file without copies. Frames of several
+    batches are copied into one array.
+
+    Args:
+        table (pyarrow.Table): Volume table from load_table.
+
+    Returns:
+        np.ndarray: Array of shape (epochs, rows, cols).
+    """
+    field = table.schema.field('volume')
+    rows, cols = json.loads(field.metadata[b'shape'])
+    chunks = [
+        chunk.flatten().to_numpy(zero_copy_only=True)
+        for chunk in table.column('volume').chunks
+    ]
+    if len(chunks) == 1:
+        values = chunks[0]
+    else:
+        values = np.concatenate(chunks)
+    return values.reshape(len(table), rows, cols)
+
+
+@beartype
+def save_frame(path: str, frame: pd.DataFrame) -> None:
+    """Write a pandas frame, e.g. experiment results, to a Feather file.
+
+    Args:
+        path (str): Path of the file to write to.
+        frame (pd.DataFrame): Frame to write, its index is kept.
+    """
+    pa = import_pyarrow()
+    save_table(path, pa.Table.from_pandas(frame))
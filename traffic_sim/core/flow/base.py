@@ -1,16 +1,51 @@
 """Base class for traffic flow operations."""
 
+from typing import Optional
+
 from beartype import beartype
 
+# (row, col) offsets of the possible moves, in the order ties are broken
+MOVES = ((-1, 0), (0, 0), (1, 0), (0, -1), (0, 1))
+MOVE_SLOTS = {offset: slot for slot, offset in enumerate(MOVES)}
+
+
+def move_slot(location: tuple, move: tuple) -> int:
+    """Return the index of a move from a location in a move buffer.
+
+    Args:
+        location (tuple): (row, col) of the current location.
+        move (tuple): (row, col) of the move.
+
+    Returns:
+        int: Index of the move.
+    """
+    return MOVE_SLOTS[(move[0] - location[0], move[1] - location[1])]
+
 
 class FlowHelper(object):
-    """Flow helper class."""
+    """Flow helper class.
+
+    The cost of each possible move is kept in a fixed-size buffer indexed
+    like MOVES, with None marking moves that aren't possible.
+    """
+
+    __slots__ = (
+        'prev',
+        'location',
+        'dest',
+        'volume',
+        'members',
+        'costs',
+        'trips',
+    )
 
     prev: tuple
     location: tuple
     dest: tuple
     volume: int
-    possible_moves: dict
+    members: list[int]
+    costs: list
+    trips: Optional[list[tuple[int, int]]]
 
     @beartype
     def __init__(
@@ -27,11 +62,49 @@ class FlowHelper(object):
             dest (tuple): (row, col) of the destination.
             volume (int): The volume of the flow.
         """
+        self.costs = [None] * len(MOVES)
+        self.reset(location, dest, volume)
+
+    @beartype
+    def reset(self, location: tuple, dest: tuple, volume: int) -> None:
+        """
+        Reinitialize the flow, so a completed flow can be reused.
+
+        Args:
+            location (tuple): (row, col) of the current location.
+            dest (tuple): (row, col) of the destination.
+            volume (int): The volume of the flow.
+        """
+        self.prev = None
         self.location = location
         self.dest = dest
         self.volume = volume
+        # volumes of the flows coalesced into this one
+        self.members = [volume]
+        # epoch each member was spawned in and its free-flow distance,
+        # only tracked for flows spawned while a matrix records metrics
+        self.trips = None
         self.renew_moves()
 
+    @property
+    def possible_moves(self) -> dict:
+        """
+        Return the possible moves, built from the move buffer.
+
+        The dict is built on every access, so it is meant for inspecting a
+        flow. The matrices read the move buffer instead.
+
+        Returns:
+            dict: Dictionary of possible moves with position as the key and
+            cost as the value.
+        """
+        row, col = self.location
+        return {
+            (row + diff_i, col + diff_j): cost
+            for (diff_i, diff_j), cost in zip(MOVES, self.costs)
+            if cost is not None
+        }
+
     @beartype
     def move_params(self) -> tuple[int, int, int, int]:
         """
@@ -53,7 +126,12 @@ class FlowHelper(object):
         Returns:
             List[tuple]: List of possible moves.
         """
-        return list(self.possible_moves.keys())
+        row, col = self.location
+        return [
+            (row + diff_i, col + diff_j)
+            for (diff_i, diff_j), cost in zip(MOVES, self.costs)
+            if cost is not None
+        ]
 
     @beartype
     def is_complete(self) -> bool:
@@ -73,7 +151,10 @@ class FlowHelper(object):
         Args:
             move (tuple): (row, col) of the move to remove.
         """
-        self.possible_moves.pop(move)
+        slot = move_slot(self.location, move)
+        if self.costs[slot] is None:
+            raise KeyError(move)
+        self.costs[slot] = None
 
     def step(self) -> None:
         """
@@ -83,6 +164,12 @@ class FlowHelper(object):
         current location. Also, update the previous location.
         """
         self.prev = self.location
-        if not self.possible_moves:
+        best = None
+        for slot, cost in enumerate(self.costs):
+            if cost is not None and (best is None or cost < self.costs[best]):
+                best = slot
+        if best is None:
             return
-        self.location = min(self.possible_moves, key=self.possible_moves.get)
+        row, col = self.location
+        diff_i, diff_j = MOVES[best]
+        self.location = (row + diff_i, col + diff_j)
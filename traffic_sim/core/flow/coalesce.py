@@ -0,0 +1,71 @@
+"""Merging of traffic flows that share location and destination."""
+
+from beartype import beartype
+
+from traffic_sim.core.flow.flow import TrafficFlow
+
+
+@beartype
+def merge_flows(flow: TrafficFlow, other: TrafficFlow) -> None:
+    """Absorb a flow with the same location and destination into another.
+
+    Args:
+        flow (TrafficFlow): Flow to absorb into.
+        other (TrafficFlow): Flow to absorb.
+    """
+    flow.members.extend(other.members)
+    if flow.trips is None or other.trips is None:
+        # trips are only timed if they are known for every member
+        flow.trips = None
+    else:
+        flow.trips.extend(other.trips)
+    flow.volume += other.volume
+
+
+@beartype
+def split_flow(flow: TrafficFlow, indices: list[int]) -> TrafficFlow:
+    """Split off members of a flow into a new flow at the same location.
+
+    Args:
+        flow (TrafficFlow): Flow to split.
+        indices (List[int]): Indices of the members to split off.
+
+    Returns:
+        TrafficFlow: New flow carrying the split off members.
+    """
+    taken = set(indices)
+    kept = [idx for idx in range(len(flow.members)) if idx not in taken]
+    members = [flow.members[idx] for idx in indices]
+
+    part = type(flow)(flow.location, flow.dest, sum(members))
+    part.members = members
+    if flow.trips is not None:
+        part.trips = [flow.trips[idx] for idx in indices]
+        flow.trips = [flow.trips[idx] for idx in kept]
+
+    flow.members = [flow.members[idx] for idx in kept]
+    flow.volume -= part.volume
+    return part
+
+
+@beartype
+def coalesce_flows(flows: list[TrafficFlow]) -> list[TrafficFlow]:
+    """Merge flows sharing location and destination into one flow.
+
+    Merged flows have the same moves, so stepping them together gives the
+    same volume per cell as stepping them one by one.
+
+    Args:
+        flows (List[TrafficFlow]): Flows to merge.
+
+    Returns:
+        List[TrafficFlow]: One flow per location and destination.
+    """
+    groups = {}
+    for flow in flows:
+        key = (flow.location, flow.dest)
+        if key in groups:
+            merge_flows(groups[key], flow)
+        else:
+            groups[key] = flow
+    return list(groups.values())
@@ -3,17 +3,19 @@
 from beartype import beartype
 
 from traffic_sim.core.distance import euclidean
-from traffic_sim.core.flow.base import FlowHelper
+from traffic_sim.core.flow.base import MOVES, FlowHelper, move_slot
 
 
 class TrafficFlow(FlowHelper):
     """A traffic flow represents a group of vehicles."""
 
+    __slots__ = ()
+
     prev: tuple
     location: tuple
     dest: tuple
     volume: int
-    possible_moves: dict
+    costs: list
 
     def __str__(self) -> str:
         """
@@ -53,8 +55,23 @@ class TrafficFlow(FlowHelper):
         return moves
 
     def renew_moves(self) -> None:
-        """Renew the possible moves."""
-        self.possible_moves = self.all_moves()
+        """Renew the possible moves in place."""
+        diff_x = self.location[0] - self.dest[0]
+        diff_y = self.location[1] - self.dest[1]
+        for slot, (diff_i, diff_j) in enumerate(MOVES):
+            self.costs[slot] = (
+                (diff_x + diff_i) ** 2 + (diff_y + diff_j) ** 2
+            ) ** 0.5
+
+    @beartype
+    def move_to(self, move: tuple) -> None:
+        """Move to a given location, updating the previous location.
+
+        Args:
+            move (tuple): (row, col) of the location to move to.
+        """
+        self.prev = self.location
+        self.location = move
 
     @beartype
     def update_move(self, move: tuple, new: float) -> None:
@@ -64,7 +81,7 @@ class TrafficFlow(FlowHelper):
             move (tuple): The move to update.
             new (int): The value to update the move with.
         """
-        self.possible_moves[move] = new
+        self.costs[move_slot(self.location, move)] = new
 
     @beartype
     def cost(self, move: tuple) -> float:
@@ -76,4 +93,7 @@ class TrafficFlow(FlowHelper):
         Returns:
             float: The cost of the move.
         """
-        return self.possible_moves[move]
+        cost = self.costs[move_slot(self.location, move)]
+        if cost is None:
+            raise KeyError(move)
+        return cost
@@ -0,0 +1,56 @@
+"""Free list of completed traffic flows."""
+
+from typing import Optional
+
+from beartype import beartype
+
+from traffic_sim.core.distance import manhattan
+from traffic_sim.core.flow.flow import TrafficFlow
+
+
+class FlowPool(object):
+    """Completed flows kept for reuse, so short-lived flows aren't rebuilt."""
+
+    flows: list[TrafficFlow]
+
+    def __init__(self) -> None:
+        """Initialize an empty pool."""
+        self.flows = []
+
+    @beartype
+    def new_flow(
+        self,
+        location: tuple,
+        dest: tuple,
+        volume: int,
+        born: Optional[int] = None,
+    ) -> TrafficFlow:
+        """Return a new flow, reusing a completed flow if there is one.
+
+        Args:
+            location (tuple): (row, col) of the origin.
+            dest (tuple): (row, col) of the destination.
+            volume (int): The volume of the flow.
+            born (Optional[int]): Epoch the flow is spawned in, None to
+                not track its trip.
+
+        Returns:
+            TrafficFlow: New traffic flow.
+        """
+        if self.flows:
+            flow = self.flows.pop()
+            flow.reset(location, dest, volume)
+        else:
+            flow = TrafficFlow(location, dest, volume)
+        if born is not None:
+            flow.trips = [(born, manhattan(location, dest))]
+        return flow
+
+    @beartype
+    def release(self, flow: TrafficFlow) -> None:
+        """Return a completed flow to the pool.
+
+        Args:
+            flow (TrafficFlow): Flow that won't be used anymore.
+        """
+        self.flows.append(flow)
@@ -3,12 +3,34 @@
 import numpy as np
 from beartype import beartype
 
-from traffic_sim.core.rand import RandomGenerator
+from traffic_sim.core.matrix.layout import RoadLayout
+from traffic_sim.core.rand import RandomGenerator, Seed
+
+
+@beartype
+def full_mask(cmatrix: np.ndarray, vmatrix: np.ndarray) -> np.ndarray:
+    """Return a mask of the full cells of a volume matrix.
+
+    A cell is full when it is occupied and its volume equals its capacity.
+    This is the one definition behind the full cells metric and
+    TrafficMatrix.full_cells.
+
+    Args:
+        cmatrix (np.ndarray): Capacity matrix to compare to.
+        vmatrix (np.ndarray): Volume matrix to find full cells in.
+
+    Returns:
+        np.ndarray: Boolean array of the shape of the matrices.
+    """
+    return (vmatrix > 0) & (vmatrix == cmatrix)
 
 
 class MatrixHelper(RandomGenerator):
     """Matrix helper class."""
 
+    # arrays read from a road layout by use_layout
+    layout_keys = ('cmatrix',)
+
     rows: int
     cols: int
     cmatrix: np.ndarray
@@ -19,14 +41,14 @@ class MatrixHelper(RandomGenerator):
         self,
         rows: int,
         cols: int,
-        seed: int = None,
+        seed: Seed = None,
     ):
         """Initialize matrix helper class.
 
         Args:
             rows (int): Number of rows in matrix.
             cols (int): Number of columns in matrix.
-            seed (int): Random seed.
+            seed (Seed): Random seed.
         """
         super().__init__(seed)
         self.rows = rows
@@ -36,10 +58,22 @@ class MatrixHelper(RandomGenerator):
         self.cmatrix = np.zeros((rows, cols), dtype=int)
         self.vmatrix = np.zeros((rows, cols), dtype=int)
 
+        # shared road layout, if any
+        self.layout = None
+
     def clear_volume(self) -> None:
         """Clear traffic volume matrix."""
         self.vmatrix = np.zeros((self.rows, self.cols), dtype=int)
 
+    @beartype
+    def use_layout(self, layout: RoadLayout) -> None:
+        """Read the arrays named in layout_keys from a road layout.
+
+        Args:
+            layout (RoadLayout): Layout to attach, possibly shared.
+        """
+        layout.bind(self)
+
     @beartype
     def capacity(self, pos: tuple) -> int:
         """Return traffic cell capacity given a position.
@@ -106,7 +140,10 @@ class MatrixHelper(RandomGenerator):
             second element.
         """
         # select cells with traffic capacity
-        idxs = np.where(self.cmatrix > 0)
+        if self.layout is None:
+            idxs = np.where(self.cmatrix > 0)
+        else:
+            idxs = self.layout.open_cells
 
         # select num_cells cells randomly
         possible_idxs = range(len(idxs[0]))
@@ -3,13 +3,23 @@
 import numpy as np
 from beartype import beartype
 
+from traffic_sim.core.matrix.moves import (
+    LegalMoves,
+    allow_moves,
+    pack_directions,
+    unpack_directions,
+)
 from traffic_sim.core.matrix.traffic import TrafficMatrix
+from traffic_sim.core.rand import Seed
 
 
 class DirectedMatrix(TrafficMatrix):
     """Directed traffic matrix."""
 
+    layout_keys = ('cmatrix', 'dmatrix')
+
     dmatrix: np.ndarray
+    legal: LegalMoves
 
     @beartype
     def __init__(
@@ -17,24 +27,26 @@ class DirectedMatrix(TrafficMatrix):
         rows: int,
         cols: int,
         density: float = 0.05,
-        seed: int = 0,
+        seed: Seed = None,
     ):
         """Initialize a directed traffic matrix.
 
-        dmatrix is a numpy array of shape (rows, cols, 2) where the first
-        dimension is the row and the second dimension is the column. The third
-        dimension is a tuple of the allowed directions of the form (up, down,
-        left, right). 1 indicates that traffic flows in that cell can move in
-        that direction. 0 indicates that traffic can't move in that direction.
+        dmatrix is a numpy array of shape (rows, cols) holding one uint8
+        bitmask per cell of the allowed directions (UP, DOWN, LEFT, RIGHT).
+        A set bit indicates that traffic flows in that cell can move in
+        that direction, an unset bit that traffic can't move in that
+        direction.
 
         Args:
             rows (int): Number of rows.
             cols (int): Number of columns.
             density (float): Traffic density. Defaults to 0.05.
-            seed (int): Random seed. Defaults to None.
+            seed (Seed): Random seed. Defaults to None.
         """
         super().__init__(rows, cols, density, seed)
-        self.dmatrix = np.zeros((rows, cols, 4), dtype=bool)
+        self.dmatrix = np.zeros((rows, cols), dtype=np.uint8)
+        # legal moves of each cell, see legal_table
+        self.legal = LegalMoves()
 
     @beartype
     def set_direction(
@@ -42,16 +54,16 @@ class DirectedMatrix(TrafficMatrix):
         pos: tuple[int, int],
         dirs: tuple[bool, bool, bool, bool],
     ) -> None:
-        """Set direction and location of traffic
-        
+        """Set direction and location of traffic.
+
         Args:
             pos (tuple): Location of traffic. Tuple of length 2 of the
             form (row, col).
             dirs (tuple): Direction of traffic. Tuple of length 4 of the
             form (up, down, left, right).
         """
-        self.dmatrix[pos] = dirs
-
+        self.dmatrix[pos] = pack_directions(dirs)
+        self.legal.invalidate()
 
     @beartype
     def set_row(self, row: int, dirs: tuple[bool, bool, bool, bool]) -> None:
@@ -62,20 +74,38 @@ class DirectedMatrix(TrafficMatrix):
             dirs (tuple): Direction of traffic. Tuple of length 4 of the
             form (up, down, left, right).
         """
-        for col in range(self.cols):
-            self.set_direction((row, col), dirs)
-        
+        self.dmatrix[row, :] = pack_directions(dirs)
+        self.legal.invalidate()
+
     @beartype
     def set_col(self, col: int, dirs: tuple[bool, bool, bool, bool]) -> None:
-        """Set the column of the directed matrix
-        
+        """Set the column of the directed matrix.
+
         Args:
             col (int): Column index.
             dirs (tuple): Direction of traffic. Tuple of length 4 of the
             form (up, down, left, right).
         """
-        for row in range(self.rows):
-            self.set_direction((row, col), dirs)
+        self.dmatrix[:, col] = pack_directions(dirs)
+        self.legal.invalidate()
+
+    @beartype
+    def set_region(
+        self,
+        start: tuple[int, int],
+        end: tuple[int, int],
+        dirs: tuple[bool, bool, bool, bool],
+    ) -> None:
+        """Set a rectangular region of the directed matrix.
+
+        Args:
+            start (tuple): (row, col) of the top left cell, inclusive.
+            end (tuple): (row, col) of the bottom right cell, exclusive.
+            dirs (tuple): Direction of traffic. Tuple of length 4 of the
+            form (up, down, left, right).
+        """
+        self.dmatrix[start[0]:end[0], start[1]:end[1]] = pack_directions(dirs)
+        self.legal.invalidate()
 
     @beartype
     def get_direction(
@@ -86,36 +116,36 @@ class DirectedMatrix(TrafficMatrix):
 
         Args:
             pos (tuple): Location of the cell in the matrix.
-        
+
         Returns:
             tuple: Direction of traffic. Tuple of length 4 of the form
             (up, down, left, right).
         """
-        return self.dmatrix[pos]
+        return unpack_directions(int(self.dmatrix[pos]))
+
+    def candidate_moves(self) -> None:
+        """Renew the moves of every flow, considering directions.
+
+        The legal move table is fetched once for all flows.
+        """
+        legal = self.legal.get(self.dmatrix, self.cmatrix).tolist()
+        for flow in self.flows:
+            allow_moves(flow, legal[flow.location[0]][flow.location[1]])
 
     def step_flows(self) -> None:
-        """Step each flow in directed matrix"""
+        """Step each flow in directed matrix."""
+        legal = self.legal.get(self.dmatrix, self.cmatrix).tolist()
+        blocked = None if self.metrics is None else []
         for flow in self.flows:
-            flow.renew_moves()
-            moves = flow.moves_list()
-            for move in moves:
-                if not self.is_valid(move) or self.is_full(move):
-                    flow.unset_move(move)
-                dirs = self.get_direction(flow.location)
-                row_diff = flow.location[0] - move[0]
-                col_diff = flow.location[1] - move[1]
-                
-                # Up
-                if row_diff == -1 and not dirs[0]:
-                    flow.unset_move(move)
-                # Down
-                elif row_diff == 1 and not dirs[1]:
-                    flow.unset_move(move)
-                # Left
-                elif col_diff == -1 and not dirs[2]:
-                    flow.unset_move(move)
-                # Right
-                elif col_diff == 1 and not dirs[3]:
+            allow_moves(flow, legal[flow.location[0]][flow.location[1]])
+            full = 0
+            for move in flow.moves_list():
+                if self.is_full(move):
                     flow.unset_move(move)
+                    full += 1
+            if blocked is not None:
+                # one entry per member, as if coalesced flows stepped apart
+                blocked.extend([full] * len(flow.members))
             flow.step()
-
+        if blocked is not None:
+            self.metrics.record_blocked(blocked)
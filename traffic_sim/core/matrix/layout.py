@@ -0,0 +1,198 @@
+"""Immutable road layouts shareable between worker processes."""
+
+import weakref
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+from beartype import beartype
+
+from traffic_sim.core.matrix.moves import LegalMoves, legal_table
+
+# keep every array in the shared block aligned for its dtype
+ALIGNMENT = 64
+
+
+@beartype
+def block_specs(arrays: dict) -> tuple[list[tuple], int]:
+    """Lay out arrays one after another in a shared memory block.
+
+    Args:
+        arrays (dict): Arrays by attribute name.
+
+    Returns:
+        Tuple[List[tuple], int]: (key, shape, dtype, offset) of each array
+        and the size of the block in bytes.
+    """
+    specs = []
+    size = 0
+    for key, array in arrays.items():
+        specs.append((key, array.shape, array.dtype.str, size))
+        size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    return specs, size
+
+
+def map_arrays(buf: memoryview, specs: list) -> dict:
+    """Return views of the arrays in a shared memory block.
+
+    Args:
+        buf (memoryview): Buffer of the shared memory block.
+        specs (list): (key, shape, dtype, offset) of each array.
+
+    Returns:
+        dict: Arrays by attribute name.
+    """
+    return {
+        key: np.ndarray(
+            shape, dtype=np.dtype(dtype), buffer=buf, offset=offset,
+        )
+        for key, shape, dtype, offset in specs
+    }
+
+
+class RoadLayout(object):
+    """Capacities, weights, directions and derived indexes of a road grid.
+
+    The arrays are computed once and are read-only. share() copies them into
+    a shared memory block, and attach() maps that block in another process
+    without copying. This is for callers that fan trials out to a process
+    pool on one host; queue workers build their layout once per process.
+
+    Views of a shared block don't keep it mapped, so a layout refuses to
+    close while matrices are bound to it.
+    """
+
+    cmatrix: np.ndarray
+    wmatrix: np.ndarray
+    dmatrix: np.ndarray
+    legal: np.ndarray
+    open_cells: np.ndarray
+
+    @beartype
+    def __init__(
+        self,
+        cmatrix: np.ndarray,
+        dmatrix: Optional[np.ndarray] = None,
+    ) -> None:
+        """Precompute a road layout.
+
+        Args:
+            cmatrix (np.ndarray): Capacity of each cell.
+            dmatrix (np.ndarray): Packed directions of each cell. Defaults
+                to no allowed directions.
+        """
+        if dmatrix is None:
+            dmatrix = np.zeros(cmatrix.shape, dtype=np.uint8)
+        self._shm = None
+        self._matrices = weakref.WeakSet()
+        self._set_arrays({
+            'cmatrix': np.array(cmatrix, dtype=int),
+            'wmatrix': np.reciprocal(cmatrix + 1, dtype=np.float64),
+            'dmatrix': np.array(dmatrix, dtype=np.uint8),
+            'legal': legal_table(dmatrix, cmatrix),
+            'open_cells': np.array(np.where(cmatrix > 0)),
+        })
+
+    @classmethod
+    @beartype
+    def attach(cls, handle: dict) -> 'RoadLayout':
+        """Map a shared layout as read-only views.
+
+        Args:
+            handle (dict): Handle returned by share() in another process.
+
+        Returns:
+            RoadLayout: Layout backed by the shared memory block.
+        """
+        layout = cls.__new__(cls)
+        layout._shm = shared_memory.SharedMemory(name=handle['name'])
+        layout._matrices = weakref.WeakSet()
+        layout._set_arrays(map_arrays(layout._shm.buf, handle['arrays']))
+        return layout
+
+    def _set_arrays(self, arrays: dict) -> None:
+        """Store the arrays as read-only attributes.
+
+        Args:
+            arrays (dict): Arrays by attribute name.
+        """
+        self._arrays = arrays
+        for key, array in arrays.items():
+            array.flags.writeable = False
+            setattr(self, key, array)
+
+    def bind(self, matrix) -> None:
+        """Point a matrix at the layout arrays instead of its own copies.
+
+        The matrix reads the arrays named in its layout_keys. A directed
+        matrix starts from the precomputed legal move table.
+
+        Args:
+            matrix (MatrixHelper): Matrix to read from the layout.
+        """
+        matrix.layout = self
+        self._matrices.add(matrix)
+        for key in matrix.layout_keys:
+            setattr(matrix, key, getattr(self, key))
+        # the legal move table is derived from the directions
+        if 'dmatrix' in matrix.layout_keys:
+            matrix.legal = LegalMoves(self.legal, self.dmatrix, self.cmatrix)
+
+    def unbind(self, matrix) -> None:
+        """Give a bound matrix its own copies of the layout arrays.
+
+        The matrix keeps working after the layout is closed.
+
+        Args:
+            matrix (MatrixHelper): Matrix bound with bind().
+        """
+        for key in matrix.layout_keys:
+            setattr(matrix, key, np.array(getattr(matrix, key)))
+        if 'dmatrix' in matrix.layout_keys:
+            matrix.legal = LegalMoves()
+        matrix.layout = None
+        self._matrices.discard(matrix)
+
+    def share(self) -> dict:
+        """Copy the arrays into a new shared memory block.
+
+        The layout then reads from the block itself. The creating process
+        must call unlink() once every worker is done.
+
+        Returns:
+            dict: Picklable handle to pass to attach().
+        """
+        specs, size = block_specs(self._arrays)
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        arrays = map_arrays(shm.buf, specs)
+        for key, shared in arrays.items():
+            shared[...] = self._arrays[key]
+        self._shm = shm
+        self._set_arrays(arrays)
+        return {'name': shm.name, 'arrays': specs}
+
+    def close(self) -> None:
+        """Release this process' mapping of the shared memory block.
+
+        Raises:
+            BufferError: If matrices are still bound to the layout.
+        """
+        if self._shm is None:
+            return
+        if self._matrices:
+            raise BufferError(
+                'Layout still has bound matrices ({0}), unbind or drop '
+                'them before closing it.'.format(len(self._matrices)),
+            )
+        self._arrays = {}
+        for key in list(vars(self)):
+            if not key.startswith('_'):
+                delattr(self, key)
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Close and free the shared memory block, see close()."""
+        shm = self._shm
+        self.close()
+        if shm is not None:
+            shm.unlink()
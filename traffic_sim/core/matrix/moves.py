@@ -0,0 +1,179 @@
+"""Packed direction bitmasks and legal move tables."""
+
+from typing import Optional
+
+import numpy as np
+from beartype import beartype
+
+from traffic_sim.core.flow.flow import TrafficFlow
+
+# direction bits, packed into one uint8 per cell
+UP = 1
+DOWN = 2
+LEFT = 4
+RIGHT = 8
+STAY = 16
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+
+# (row, col) offset of the move that each bit allows
+MOVE_OFFSETS = {
+    UP: (1, 0),
+    DOWN: (-1, 0),
+    LEFT: (0, 1),
+    RIGHT: (0, -1),
+    STAY: (0, 0),
+}
+MOVE_BITS = {offset: bit for bit, offset in MOVE_OFFSETS.items()}
+
+
+@beartype
+def pack_directions(dirs: tuple[bool, bool, bool, bool]) -> int:
+    """Pack a direction tuple into a bitmask.
+
+    Args:
+        dirs (tuple): Direction of traffic. Tuple of length 4 of the
+        form (up, down, left, right).
+
+    Returns:
+        int: Bitmask of the allowed directions.
+    """
+    mask = 0
+    for bit, allowed in zip(DIRECTIONS, dirs):
+        if allowed:
+            mask |= bit
+    return mask
+
+
+@beartype
+def unpack_directions(mask: int) -> tuple[bool, bool, bool, bool]:
+    """Unpack a bitmask into a direction tuple.
+
+    Args:
+        mask (int): Bitmask of the allowed directions.
+
+    Returns:
+        tuple: Direction of traffic. Tuple of length 4 of the form
+        (up, down, left, right).
+    """
+    up, down, left, right = (bool(mask & bit) for bit in DIRECTIONS)
+    return up, down, left, right
+
+
+def shift_mask(mask: np.ndarray, diff_i: int, diff_j: int) -> np.ndarray:
+    """Return a mask of the cell at offset (diff_i, diff_j) from each cell.
+
+    Cells whose neighbour falls outside of the matrix are False.
+
+    Args:
+        mask (np.ndarray): Boolean mask to shift.
+        diff_i (int): Row offset of the neighbour.
+        diff_j (int): Column offset of the neighbour.
+
+    Returns:
+        np.ndarray: Shifted boolean mask.
+    """
+    rows, cols = mask.shape
+    shifted = np.zeros_like(mask)
+    shifted[
+        max(-diff_i, 0):rows - max(diff_i, 0),
+        max(-diff_j, 0):cols - max(diff_j, 0),
+    ] = mask[
+        max(diff_i, 0):rows - max(-diff_i, 0),
+        max(diff_j, 0):cols - max(-diff_j, 0),
+    ]
+    return shifted
+
+
+@beartype
+def legal_table(dmatrix: np.ndarray, cmatrix: np.ndarray) -> np.ndarray:
+    """Return the per-cell bitmask of legal moves.
+
+    A move is legal when the cell allows its direction, the target cell is
+    within bounds and the target cell has capacity. Staying in place is
+    always legal.
+
+    Args:
+        dmatrix (np.ndarray): Packed directions of each cell.
+        cmatrix (np.ndarray): Capacity of each cell.
+
+    Returns:
+        np.ndarray: uint8 array of the legal moves of each cell.
+    """
+    open_cells = cmatrix > 0
+    legal = np.full(cmatrix.shape, STAY, dtype=np.uint8)
+    for bit in DIRECTIONS:
+        target_open = shift_mask(open_cells, *MOVE_OFFSETS[bit])
+        allowed = (dmatrix & bit).astype(bool) & target_open
+        legal[allowed] |= bit
+    return legal
+
+
+@beartype
+def allow_moves(flow: TrafficFlow, allowed: int) -> None:
+    """Renew the moves of a flow, keeping those a bitmask allows.
+
+    Args:
+        flow (TrafficFlow): Flow to renew the moves of.
+        allowed (int): Bitmask of legal moves from the flow's cell.
+    """
+    flow.renew_moves()
+    row, col = flow.location
+    for move in flow.moves_list():
+        if not allowed & MOVE_BITS[(move[0] - row, move[1] - col)]:
+            flow.unset_move(move)
+
+
+class LegalMoves(object):
+    """Legal move table of a directed matrix, rebuilt when it goes stale.
+
+    The table only depends on the directions and on which cells have
+    capacity. It is rebuilt when it was invalidated, when the direction
+    matrix is replaced or when the set of cells with capacity changes.
+    """
+
+    table: Optional[np.ndarray]
+
+    @beartype
+    def __init__(
+        self,
+        table: Optional[np.ndarray] = None,
+        dmatrix: Optional[np.ndarray] = None,
+        cmatrix: Optional[np.ndarray] = None,
+    ) -> None:
+        """Initialize the table, possibly with a precomputed one.
+
+        Args:
+            table (Optional[np.ndarray]): Precomputed table, see legal_table.
+            dmatrix (Optional[np.ndarray]): Directions the table is for.
+            cmatrix (Optional[np.ndarray]): Capacities the table is for.
+        """
+        self.table = table
+        self._dmatrix = dmatrix
+        self._open_cells = None if cmatrix is None else cmatrix > 0
+
+    def invalidate(self) -> None:
+        """Rebuild the table on its next use, e.g. after directions change."""
+        self.table = None
+
+    @beartype
+    def get(self, dmatrix: np.ndarray, cmatrix: np.ndarray) -> np.ndarray:
+        """Return the table of the matrices, rebuilding it if stale.
+
+        Args:
+            dmatrix (np.ndarray): Packed directions of each cell.
+            cmatrix (np.ndarray): Capacity of each cell.
+
+        Returns:
+            np.ndarray: uint8 array of the legal moves of each cell.
+        """
+        open_cells = cmatrix > 0
+        stale = (
+            self.table is None
+            or dmatrix is not self._dmatrix
+            or not np.array_equal(open_cells, self._open_cells)
+        )
+        if stale:
+            self.table = legal_table(dmatrix, cmatrix)
+            self._dmatrix = dmatrix
+            self._open_cells = open_cells
+        return self.table
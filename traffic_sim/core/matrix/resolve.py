@@ -0,0 +1,322 @@
+"""Capacity arbitration for resolving all flow moves at once."""
+
+import numpy as np
+from beartype import beartype
+
+from traffic_sim.core.flow.base import MOVES
+from traffic_sim.core.flow.coalesce import split_flow
+
+
+@beartype
+def flow_priority(
+    origins: np.ndarray,
+    dests: np.ndarray,
+    volumes: np.ndarray,
+) -> np.ndarray:
+    """Rank flows by a key that doesn't depend on their order in a list.
+
+    Flows with equal keys are interchangeable, so ties don't change the
+    resulting state.
+
+    Args:
+        origins (np.ndarray): Flat index of each flow's location.
+        dests (np.ndarray): Flat index of each flow's destination.
+        volumes (np.ndarray): Volume of each flow.
+
+    Returns:
+        np.ndarray: Priority of each flow, lower goes first.
+    """
+    order = np.lexsort((volumes, dests, origins))
+    priority = np.empty_like(order)
+    priority[order] = np.arange(len(order))
+    return priority
+
+
+@beartype
+def rank_moves(
+    buffers: np.ndarray,
+    origins: np.ndarray,
+    cols: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Rank the move buffers of flows best first.
+
+    Moves with equal costs keep the order of MOVES, as in TrafficFlow.step.
+
+    Args:
+        buffers (np.ndarray): (flows, moves) cost of each move, NaN where
+            the move isn't possible.
+        origins (np.ndarray): Flat index of each flow's location.
+        cols (int): Number of columns of the matrix.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (candidates, costs) of each flow
+        ranked best first, with candidates as flat indices padded with -1.
+    """
+    buffers = np.where(np.isnan(buffers), np.inf, buffers)
+    order = np.argsort(buffers, axis=1, kind='stable')
+    costs = np.take_along_axis(buffers, order, axis=1)
+    offsets = np.array([diff_i * cols + diff_j for diff_i, diff_j in MOVES])
+    candidates = np.where(
+        np.isinf(costs), -1, origins[:, np.newaxis] + offsets[order],
+    )
+    return candidates, costs
+
+
+@beartype
+def propose_moves(
+    targets: np.ndarray,
+    costs: np.ndarray,
+    origins: np.ndarray,
+    priority: np.ndarray,
+    pending: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Collect the proposals of the pending flows in one round.
+
+    Flows proposing no move or their own cell are no longer pending.
+
+    Args:
+        targets (np.ndarray): Flat index of the proposal of each flow.
+        costs (np.ndarray): Cost of the proposal of each flow.
+        origins (np.ndarray): Flat index of each flow's location.
+        priority (np.ndarray): Priority of each flow, lower goes first.
+        pending (np.ndarray): Mask of unresolved flows, updated in place.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (flows, targets) of the proposals,
+        sorted by target, cost and priority.
+    """
+    idxs = np.flatnonzero(pending)
+    stay = (targets[idxs] < 0) | (targets[idxs] == origins[idxs])
+    pending[idxs[stay]] = False
+    idxs = idxs[~stay]
+    idxs = idxs[np.lexsort((priority[idxs], costs[idxs], targets[idxs]))]
+    return idxs, targets[idxs]
+
+
+@beartype
+def fit_volumes(
+    targets: np.ndarray,
+    volumes: np.ndarray,
+    free: np.ndarray,
+) -> np.ndarray:
+    """Accept proposals while the volume per target fits its free capacity.
+
+    Args:
+        targets (np.ndarray): Sorted flat index of each proposal.
+        volumes (np.ndarray): Volume of each proposal.
+        free (np.ndarray): Free capacity of each cell.
+
+    Returns:
+        np.ndarray: Mask of the accepted proposals.
+    """
+    # cumulative volume within each group of equal targets
+    csum = np.cumsum(volumes)
+    starts = np.ones(len(targets), dtype=bool)
+    starts[1:] = targets[1:] != targets[:-1]
+    base = np.maximum.accumulate(np.where(starts, csum - volumes, 0))
+    return csum - base <= free[targets]
+
+
+@beartype
+def reserve_moves(
+    candidates: np.ndarray,
+    costs: np.ndarray,
+    origins: np.ndarray,
+    volumes: np.ndarray,
+    priority: np.ndarray,
+    free: np.ndarray,
+) -> np.ndarray:
+    """Choose a target cell for every flow without exceeding capacity.
+
+    In each round every unresolved flow proposes its next best candidate.
+    Proposals are sorted by target, cost and priority and accepted while
+    the cumulative volume per target fits in the free capacity of that
+    target. Rejected flows propose their next candidate in the following
+    round, and flows that run out of candidates or propose their own cell
+    stay in place.
+
+    Args:
+        candidates (np.ndarray): (flows, moves) flat indices of the moves of
+            each flow ranked best first, padded with -1.
+        costs (np.ndarray): (flows, moves) cost of each candidate.
+        origins (np.ndarray): Flat index of each flow's location.
+        volumes (np.ndarray): Volume of each flow.
+        priority (np.ndarray): Priority of each flow, lower goes first.
+        free (np.ndarray): Free capacity of each cell.
+
+    Returns:
+        np.ndarray: Flat index of the chosen cell of each flow.
+    """
+    chosen = origins.copy()
+    pending = np.ones(len(origins), dtype=bool)
+    free = free.copy()
+    for rank in range(candidates.shape[1]):
+        if not pending.any():
+            break
+        idxs, targets = propose_moves(
+            candidates[:, rank], costs[:, rank], origins, priority, pending,
+        )
+        accepted = fit_volumes(targets, volumes[idxs], free)
+        idxs = idxs[accepted]
+        chosen[idxs] = targets[accepted]
+        pending[idxs] = False
+        free -= np.bincount(
+            targets[accepted], weights=volumes[idxs], minlength=len(free),
+        ).astype(free.dtype)
+    return chosen
+
+
+@beartype
+def group_members(
+    owners: np.ndarray,
+    chosen: np.ndarray,
+    num_flows: int,
+) -> list[dict]:
+    """Group the members of every flow by their chosen cell.
+
+    Args:
+        owners (np.ndarray): Index of the flow of each member, sorted.
+        chosen (np.ndarray): Flat index of the chosen cell of each member.
+        num_flows (int): Number of flows.
+
+    Returns:
+        List[dict]: Per flow, member indices by chosen cell, in the order
+        the cells were first chosen.
+    """
+    members = np.arange(len(owners)) - np.searchsorted(owners, owners)
+    groups = [{} for _ in range(num_flows)]
+    for owner, target, member in zip(
+        owners.tolist(), chosen.tolist(), members.tolist(),
+    ):
+        groups[owner].setdefault(target, []).append(member)
+    return groups
+
+
+class MoveResolver(object):
+    """Moves every flow of a matrix at once without exceeding capacity.
+
+    All flows propose their moves against the same state, and conflicts
+    are settled by reserve_moves. The result doesn't depend on the order
+    of the flow list, and no cell receives more volume than its free
+    capacity.
+    """
+
+    @beartype
+    def __init__(self, matrix) -> None:
+        """Initialize a resolver.
+
+        Args:
+            matrix (TrafficMatrix): Matrix whose flows move.
+        """
+        self.matrix = matrix
+
+    def flat_cells(self, positions: list[tuple]) -> np.ndarray:
+        """Return the flat index of each (row, col) position.
+
+        Args:
+            positions (List[tuple]): (row, col) positions.
+
+        Returns:
+            np.ndarray: Flat index of each position.
+        """
+        cols = self.matrix.cols
+        return np.array(
+            [row * cols + col for row, col in positions], dtype=np.int64,
+        )
+
+    def move_table(self) -> tuple[np.ndarray, ...]:
+        """Collect the ranked candidate moves of every flow.
+
+        Coalesced flows get one row per member, so capacity is arbitrated
+        exactly as for separate flows.
+
+        Returns:
+            Tuple[np.ndarray, ...]: (candidates, costs, origins, dests,
+            volumes, owners) with cells as flat indices and owners as the
+            index of the flow of each row. Candidates are ranked best first
+            and padded with -1.
+        """
+        self.matrix.candidate_moves()
+        flows = self.matrix.flows
+        origins = self.flat_cells([flow.location for flow in flows])
+        candidates, costs = rank_moves(
+            np.array(
+                [flow.costs for flow in flows], dtype=np.float64,
+            ).reshape(-1, len(MOVES)),
+            origins,
+            self.matrix.cols,
+        )
+        owners = np.repeat(
+            np.arange(len(flows)), [len(flow.members) for flow in flows],
+        )
+        return (
+            candidates[owners],
+            costs[owners],
+            origins[owners],
+            self.flat_cells([flow.dest for flow in flows])[owners],
+            np.array(
+                [vol for flow in flows for vol in flow.members],
+                dtype=np.int64,
+            ),
+            owners,
+        )
+
+    def free_capacity(
+        self,
+        origins: np.ndarray,
+        volumes: np.ndarray,
+    ) -> np.ndarray:
+        """Return the capacity of each cell not taken by the flows in it.
+
+        Args:
+            origins (np.ndarray): Flat index of each flow's location.
+            volumes (np.ndarray): Volume of each flow.
+
+        Returns:
+            np.ndarray: Free capacity of each cell as a flat array.
+        """
+        cmatrix = self.matrix.cmatrix
+        occupied = np.bincount(
+            origins, weights=volumes, minlength=cmatrix.size,
+        )
+        return cmatrix.ravel() - occupied.astype(np.int64)
+
+    def resolve(self) -> None:
+        """Choose a cell for every flow and move the flows there."""
+        if not self.matrix.flows:
+            return
+        candidates, costs, origins, dests, volumes, owners = self.move_table()
+        chosen = reserve_moves(
+            candidates,
+            costs,
+            origins,
+            volumes,
+            flow_priority(origins, dests, volumes),
+            self.free_capacity(origins, volumes),
+        )
+        if self.matrix.metrics is not None:
+            # a member is rejected when its best move didn't fit
+            self.matrix.metrics.record_rejected(
+                (chosen != candidates[:, 0]).astype(int).tolist(),
+            )
+        self.split_moves(owners, chosen)
+
+    def split_moves(self, owners: np.ndarray, chosen: np.ndarray) -> None:
+        """Move the flows to their chosen cells.
+
+        Coalesced flows whose members were sent to different cells are
+        split, and the split off flows are appended to the flow list.
+
+        Args:
+            owners (np.ndarray): Index of the flow of each member, sorted.
+            chosen (np.ndarray): Flat index of the chosen cell of each member.
+        """
+        flows = self.matrix.flows
+        moves = group_members(owners, chosen, len(flows))
+        for flow, groups in zip(list(flows), moves):
+            targets = list(groups)
+            for target in targets[1:]:
+                part = split_flow(flow, groups[target])
+                part.move_to(divmod(target, self.matrix.cols))
+                flows.append(part)
+            flow.move_to(divmod(targets[0], self.matrix.cols))
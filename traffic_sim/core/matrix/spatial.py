@@ -0,0 +1,119 @@
+"""Per-cell spatial index of traffic flows."""
+
+import numpy as np
+from beartype import beartype
+
+from traffic_sim.core.flow.flow import TrafficFlow
+
+
+class FlowIndex(object):
+    """Buckets of flows per cell in compressed sparse row layout.
+
+    Flows are sorted by flat cell index, and offsets[cell] is where the
+    bucket of a cell starts. The index is a snapshot of the flows it was
+    built from.
+    """
+
+    rows: int
+    cols: int
+    flows: np.ndarray
+    offsets: np.ndarray
+    volume: np.ndarray
+
+    @beartype
+    def __init__(self, flows: list[TrafficFlow], rows: int, cols: int):
+        """Build the index.
+
+        Args:
+            flows (List[TrafficFlow]): Flows to index.
+            rows (int): Number of rows.
+            cols (int): Number of columns.
+        """
+        self.rows = rows
+        self.cols = cols
+        locations = np.array([flow.location for flow in flows], dtype=int)
+        cells = locations.reshape(-1, 2) @ np.array([cols, 1])
+        volumes = np.array([flow.volume for flow in flows], dtype=int)
+
+        order = np.argsort(cells, kind='stable')
+        self.flows = np.empty(len(flows), dtype=object)
+        self.flows[:] = flows
+        self.flows = self.flows[order]
+
+        counts = np.bincount(cells, minlength=rows * cols)
+        self.offsets = np.zeros(rows * cols + 1, dtype=int)
+        np.cumsum(counts, out=self.offsets[1:])
+        self.volume = np.bincount(
+            cells, weights=volumes, minlength=rows * cols,
+        ).astype(int).reshape(rows, cols)
+
+    def counts(self) -> np.ndarray:
+        """Return the number of flows in each cell.
+
+        Returns:
+            np.ndarray: Array of shape (rows, cols) of flow counts.
+        """
+        return np.diff(self.offsets).reshape(self.rows, self.cols)
+
+    @beartype
+    def cell(self, pos: tuple[int, int]) -> list[TrafficFlow]:
+        """Return the flows in a cell.
+
+        Args:
+            pos (tuple): (row, col) of the cell.
+
+        Returns:
+            List[TrafficFlow]: Flows in the cell, none if it is out of
+            bounds.
+        """
+        row, col = pos
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return []
+        flat = row * self.cols + col
+        return list(self.flows[self.offsets[flat]:self.offsets[flat + 1]])
+
+    @beartype
+    def region(
+        self,
+        start: tuple[int, int],
+        end: tuple[int, int],
+    ) -> list[TrafficFlow]:
+        """Return the flows in a rectangular region.
+
+        Cells of a row are contiguous in the index. The bucket bounds of
+        every row of the region are looked up at once and only rows holding
+        flows are sliced, so the cost is a vectorized lookup per row plus
+        the number of flows returned.
+
+        Args:
+            start (tuple): (row, col) of the top left cell, inclusive.
+            end (tuple): (row, col) of the bottom right cell, exclusive.
+
+        Returns:
+            List[TrafficFlow]: Flows in the region.
+        """
+        row_offsets = np.arange(
+            max(start[0], 0), min(end[0], self.rows),
+        ) * self.cols
+        col_end = np.clip(end[1], 0, self.cols)
+        col_start = np.clip(start[1], 0, col_end)
+        spans = self.offsets[np.add.outer(row_offsets, [col_start, col_end])]
+        res = []
+        for first, last in spans[spans[:, 0] < spans[:, 1]].tolist():
+            res.extend(self.flows[first:last])
+        return res
+
+    @beartype
+    def cells(self, mask: np.ndarray) -> list[TrafficFlow]:
+        """Return the flows in the cells selected by a boolean mask.
+
+        Args:
+            mask (np.ndarray): Boolean array of shape (rows, cols).
+
+        Returns:
+            List[TrafficFlow]: Flows in the selected cells.
+        """
+        res = []
+        for flat in np.flatnonzero(mask.ravel() & (np.diff(self.offsets) > 0)):
+            res.extend(self.flows[self.offsets[flat]:self.offsets[flat + 1]])
+        return res
@@ -3,9 +3,38 @@
 import numpy as np
 from beartype import beartype
 
+from traffic_sim.core.demand import DemandSource, record_flows
 from traffic_sim.core.distance import coord_list
+from traffic_sim.core.flow.coalesce import coalesce_flows
 from traffic_sim.core.flow.flow import TrafficFlow
-from traffic_sim.core.matrix.base import MatrixHelper
+from traffic_sim.core.flow.pool import FlowPool
+from traffic_sim.core.matrix.base import MatrixHelper, full_mask
+from traffic_sim.core.matrix.resolve import MoveResolver
+from traffic_sim.core.matrix.spatial import FlowIndex
+from traffic_sim.core.metrics import TrafficMetrics
+from traffic_sim.core.rand import Seed
+
+
+@beartype
+def prune_moves(matrix: MatrixHelper, flow: TrafficFlow) -> int:
+    """Unset the moves of a flow out of bounds or into full cells.
+
+    Args:
+        matrix (MatrixHelper): Matrix the flow moves in.
+        flow (TrafficFlow): Flow with renewed moves.
+
+    Returns:
+        int: Number of moves blocked by full cells. Cells without capacity
+        are closed rather than full, so they aren't counted.
+    """
+    full = 0
+    for move in flow.moves_list():
+        if not matrix.is_valid(move):
+            flow.unset_move(move)
+        elif matrix.is_full(move):
+            flow.unset_move(move)
+            full += int(matrix.cmatrix[move] > 0)
+    return full
 
 
 class TrafficMatrix(MatrixHelper):
@@ -17,6 +46,14 @@ class TrafficMatrix(MatrixHelper):
     vmatrix: np.ndarray
     density: float
     flows: TrafficFlow
+    synchronous: bool
+    coalesce: bool
+    demand: DemandSource
+    epoch: int
+    recycle: bool
+    pool: FlowPool
+    index: FlowIndex
+    metrics: TrafficMetrics
 
     @beartype
     def __init__(
@@ -24,7 +61,7 @@ class TrafficMatrix(MatrixHelper):
         rows: int,
         cols: int,
         density: float = 0.05,
-        seed: int = 0,
+        seed: Seed = None,
     ):
         """Initialize a traffic simulation object.
 
@@ -32,62 +69,139 @@ class TrafficMatrix(MatrixHelper):
             rows (int): Number of rows in the traffic matrix.
             cols (int): Number of columns in the traffic matrix.
             density (float): Density of traffic flow simulation.
-            seed (int): Random seed.
+            seed (Seed): Random seed. Defaults to None.
         """
         super().__init__(rows, cols, seed)
         self.density = density
         self.flows = []
+        # flows per cell as of the last update_matrix
+        self.index = FlowIndex(self.flows, rows, cols)
+
+        # resolve all moves at once instead of flow by flow
+        self.synchronous = False
+        # merge flows sharing location and destination into one flow
+        self.coalesce = False
+        # replay recorded demand instead of spawning flows randomly
+        self.demand = None
+        self.epoch = 0
+        # reuse completed flows; flows are then only valid for one epoch
+        self.recycle = False
+        self.pool = FlowPool()
+        # KPIs recorded while stepping, None when disabled
+        self.metrics = None
 
     def step(self) -> None:
         """Step through the traffic simulation."""
         self.generate_flows()
-        self.step_flows()
+        if self.coalesce:
+            self.flows = coalesce_flows(self.flows)
+        if self.synchronous:
+            MoveResolver(self).resolve()
+        else:
+            self.step_flows()
         self.update_matrix()
         self.pop_flows()
+        self.epoch += 1
 
     def generate_flows(self) -> None:
         """Generate traffic flows based on density.
 
+        When a demand source is set, the recorded demand of the current
+        epoch is injected instead.
+
         Returns:
             None when no flows are generated.
         """
-        num_cells = self.rows * self.cols * self.density
-        num_cells = round(num_cells) - len(self.flows)
-        if num_cells <= 0:
-            # no new flows to generate, so return
-            return None
-
-        # create flow origins and destinations
-        origins = coord_list(self.select_cells(num_cells))
-        dests = coord_list(self.select_cells(num_cells))
-
-        for idx in range(num_cells):
-            # volume of the flow is a random number between 1 and capacity-1
-            capacity = self.capacity(origins[idx])
-            volume = self.rng.choice(range(1, capacity))
-
-            flow = TrafficFlow(origins[idx], dests[idx], int(volume))
-            self.flows.append(flow)
+        if self.demand is None:
+            # coalesced flows count once per member
+            num_cells = round(self.rows * self.cols * self.density) - sum(
+                len(flow.members) for flow in self.flows
+            )
+            if num_cells <= 0:
+                # no new flows to generate, so return
+                return None
+
+            # create flow origins and destinations
+            origins = coord_list(self.select_cells(num_cells))
+            dests = coord_list(self.select_cells(num_cells))
+
+            # volume of each flow is a random number between 1 and capacity-1
+            capacities = [self.capacity(origin) for origin in origins]
+            volumes = self.rng.integers(1, capacities).tolist()
+            trips = zip(origins, dests, volumes)
+        else:
+            trips = record_flows(self.demand.pop(self.epoch))
+
+        # trips are only timed when metrics are recorded
+        born = None if self.metrics is None else self.epoch
+        self.flows.extend(self.pool.new_flow(*trip, born) for trip in trips)
 
     def step_flows(self) -> None:
         """Get the next move for every flow and execute."""
+        blocked = None if self.metrics is None else []
         for flow in self.flows:
             flow.renew_moves()
-            moves = flow.moves_list()
-            for move in moves:
-                if not self.is_valid(move) or self.is_full(move):
-                    flow.unset_move(move)
+            full = prune_moves(self, flow)
+            if blocked is not None:
+                # one entry per member, as if coalesced flows stepped apart
+                blocked.extend([full] * len(flow.members))
             flow.step()
+        if blocked is not None:
+            self.metrics.record_blocked(blocked)
+
+    def candidate_moves(self) -> None:
+        """Renew the moves of every flow, keeping those it may propose.
+
+        Current volume is ignored, capacity is arbitrated by MoveResolver.
+        """
+        for flow in self.flows:
+            flow.renew_moves()
+            for move in flow.moves_list():
+                if not self.is_valid(move):
+                    flow.unset_move(move)
 
     def pop_flows(self) -> None:
-        """Remove completed flows."""
-        self.flows = [flow for flow in self.flows if not flow.is_complete()]
+        """Remove completed flows.
+
+        When recycling, the flow list is compacted in place and completed
+        flows go to the pool, so a previous epoch's flows may be reused.
+        """
+        if self.metrics is not None:
+            trips = [
+                trip
+                for flow in self.flows if flow.is_complete()
+                for trip in flow.trips or ()
+            ]
+            self.metrics.record_completed(
+                self.epoch,
+                [self.epoch - born + 1 for born, _ in trips],
+                [free for _, free in trips],
+            )
+
+        if not self.recycle:
+            self.flows = [
+                flow for flow in self.flows if not flow.is_complete()
+            ]
+            return
+
+        kept = 0
+        for flow in self.flows:
+            if flow.is_complete():
+                self.pool.release(flow)
+            else:
+                self.flows[kept] = flow
+                kept += 1
+        del self.flows[kept:]
 
     def update_matrix(self) -> None:
-        """Update traffic volume matrix based on current flows."""
-        self.clear_volume()
+        """Update traffic volume matrix and flow index from current flows."""
+        self.index = FlowIndex(self.flows, self.rows, self.cols)
+        self.vmatrix = self.index.volume
 
-        for flow in self.flows:
-            location = flow.location
-            volume = flow.volume
-            self.vmatrix[location] += volume
+    def blocked_flows(self) -> list[TrafficFlow]:
+        """Return the flows in full cells, as of the last update_matrix.
+
+        Returns:
+            List[TrafficFlow]: Flows in full cells.
+        """
+        return self.index.cells(full_mask(self.cmatrix, self.vmatrix))
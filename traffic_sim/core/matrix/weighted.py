@@ -3,12 +3,15 @@
 import numpy as np
 from beartype import beartype
 
-from traffic_sim.core.matrix.traffic import TrafficMatrix
+from traffic_sim.core.matrix.traffic import TrafficMatrix, prune_moves
+from traffic_sim.core.rand import Seed
 
 
 class WeightedMatrix(TrafficMatrix):
     """Weighted traffic matrix."""
 
+    layout_keys = ('cmatrix', 'wmatrix')
+
     wmatrix: np.ndarray
 
     @beartype
@@ -17,7 +20,7 @@ class WeightedMatrix(TrafficMatrix):
         rows: int,
         cols: int,
         density: float = 0.05,
-        seed: int = 0,
+        seed: Seed = None,
     ):
         """Initialize a weighted traffic matrix.
 
@@ -25,7 +28,7 @@ class WeightedMatrix(TrafficMatrix):
             rows (int): Number of rows.
             cols (int): Number of columns.
             density (float): Traffic density. Defaults to 0.05.
-            seed (int): Random seed. Defaults to None.
+            seed (Seed): Random seed. Defaults to None.
         """
         super().__init__(rows, cols, density, seed)
         self.wmatrix = np.zeros((rows, cols), dtype=np.float64)
@@ -36,15 +39,25 @@ class WeightedMatrix(TrafficMatrix):
 
     def step_flows(self) -> None:
         """Step each flow in the matrix, considering weights."""
+        blocked = None if self.metrics is None else []
         for flow in self.flows:
             flow.renew_moves()
-            moves = flow.moves_list()
-            for move in moves:
-                if not self.is_valid(move) or self.is_full(move):
-                    flow.unset_move(move)
-                else:
-                    flow.update_move(move, flow.cost(move) * self.weight(move))
+            full = prune_moves(self, flow)
+            for move in flow.moves_list():
+                flow.update_move(move, flow.cost(move) * self.weight(move))
+            if blocked is not None:
+                # one entry per member, as if coalesced flows stepped apart
+                blocked.extend([full] * len(flow.members))
             flow.step()
+        if blocked is not None:
+            self.metrics.record_blocked(blocked)
+
+    def candidate_moves(self) -> None:
+        """Renew the moves of every flow, considering weights."""
+        super().candidate_moves()
+        for flow in self.flows:
+            for move in flow.moves_list():
+                flow.update_move(move, flow.cost(move) * self.weight(move))
 
     @beartype
     def weight(self, pos: tuple) -> float:
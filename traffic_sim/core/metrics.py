@@ -0,0 +1,170 @@
+"""Metrics module for streaming traffic KPIs."""
+
+import numpy as np
+import pandas as pd
+from beartype import beartype
+
+
+class Histogram(object):
+    """Fixed-size histogram, the last bin collects every larger value."""
+
+    edges: np.ndarray
+    counts: np.ndarray
+
+    @beartype
+    def __init__(self, edges: np.ndarray) -> None:
+        """Initialize histogram.
+
+        Args:
+            edges (np.ndarray): Increasing lower edges of the bins.
+        """
+        self.edges = edges
+        self.counts = np.zeros(len(edges), dtype=int)
+
+    def add(self, values, weights=None) -> None:
+        """Count values into their bins.
+
+        Args:
+            values: Values to count.
+            weights: Weight of each value. Defaults to 1.
+        """
+        bins = np.searchsorted(self.edges, values, side='right') - 1
+        self.counts += np.bincount(
+            np.clip(bins, 0, len(self.edges) - 1),
+            weights=weights,
+            minlength=len(self.edges),
+        ).astype(int)
+
+    @beartype
+    def merge(self, other: 'Histogram') -> None:
+        """Add the counts of a histogram with the same edges.
+
+        Args:
+            other (Histogram): Histogram to merge.
+        """
+        self.counts += other.counts
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the bins and their counts.
+
+        Returns:
+            pd.DataFrame: Lower edge, upper edge and count of each bin.
+        """
+        return pd.DataFrame({
+            'lower': self.edges,
+            'upper': np.append(self.edges[1:], np.inf),
+            'count': self.counts,
+        })
+
+
+class TrafficMetrics(object):
+    """Histograms and counters of traffic KPIs, updated every epoch.
+
+    Nothing is stored per epoch or per flow, so memory doesn't grow with
+    the length of the run.
+    """
+
+    travel_time: Histogram
+    delay: Histogram
+    completions: Histogram
+    blocked: Histogram
+    counters: dict[str, int]
+
+    def __init__(self) -> None:
+        """Initialize metrics."""
+        # epochs from spawning to completing a flow
+        self.travel_time = Histogram(np.arange(0, 101))
+        # travel time over the free-flow (manhattan) distance
+        self.delay = Histogram(np.arange(0, 10.25, 0.25))
+        # flows completed per epoch
+        self.completions = Histogram(np.arange(0, 101))
+        # moves blocked by full cells per flow and epoch, cells without
+        # capacity are closed rather than full
+        self.blocked = Histogram(np.arange(0, 6))
+        # blocked_moves counts moves into full cells when flows step one
+        # by one, rejected_moves counts best moves that didn't fit when
+        # moves are resolved at once
+        self.counters = {
+            'epochs': 0,
+            'flow_steps': 0,
+            'blocked_moves': 0,
+            'rejected_moves': 0,
+            'completed': 0,
+        }
+
+    @beartype
+    def record_blocked(self, blocked: list[int]) -> None:
+        """Record the blocked moves of every flow stepped in an epoch.
+
+        Args:
+            blocked (List[int]): Number of blocked moves of each flow.
+        """
+        self.blocked.add(blocked)
+        self.counters['flow_steps'] += len(blocked)
+        self.counters['blocked_moves'] += sum(blocked)
+
+    @beartype
+    def record_rejected(self, rejected: list[int]) -> None:
+        """Record which flows had their best move rejected in an epoch.
+
+        Args:
+            rejected (List[int]): 1 for each flow whose best move was
+                rejected, else 0.
+        """
+        self.counters['flow_steps'] += len(rejected)
+        self.counters['rejected_moves'] += sum(rejected)
+
+    @beartype
+    def record_completed(
+        self,
+        epoch: int,
+        travel: list[int],
+        free_flow: list[int],
+    ) -> None:
+        """Record the flows completed in an epoch.
+
+        Coalesced flows are recorded per member.
+
+        Args:
+            epoch (int): Epoch the flows completed in.
+            travel (List[int]): Epochs each completed flow travelled.
+            free_flow (List[int]): Free-flow distance of each flow.
+        """
+        travel_arr = np.array(travel, dtype=float)
+        free_arr = np.maximum(np.array(free_flow, dtype=float), 1)
+        self.travel_time.add(travel_arr)
+        self.delay.add(travel_arr / free_arr)
+        self.completions.add([len(travel)])
+        self.counters['epochs'] += 1
+        self.counters['completed'] += len(travel)
+
+    @beartype
+    def merge(self, other: 'TrafficMetrics') -> None:
+        """Merge metrics of another run.
+
+        Args:
+            other (TrafficMetrics): Metrics to merge.
+        """
+        for name in ('travel_time', 'delay', 'completions', 'blocked'):
+            getattr(self, name).merge(getattr(other, name))
+        for name, count in other.counters.items():
+            self.counters[name] += count
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return every histogram bin and counter as rows.
+
+        Counters have no edges.
+
+        Returns:
+            pd.DataFrame: Metric, lower edge, upper edge and count.
+        """
+        frames = []
+        for name in ('travel_time', 'delay', 'completions', 'blocked'):
+            frame = getattr(self, name).to_frame()
+            frame.insert(0, 'metric', name)
+            frames.append(frame)
+        frames.append(pd.DataFrame({
+            'metric': list(self.counters),
+            'count': list(self.counters.values()),
+        }))
+        return pd.concat(frames, ignore_index=True)
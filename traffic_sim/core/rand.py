@@ -1,24 +1,80 @@
 """Random module for core functions."""
 
+from typing import Optional, Union
+
 from beartype import beartype
-from numpy.random import Generator, default_rng
+from numpy.random import Generator, SeedSequence, default_rng
+
+Seed = Optional[Union[int, SeedSequence]]
+
+
+@beartype
+def seed_sequence(seed: Seed = None) -> SeedSequence:
+    """Return the seed sequence of a seed.
+
+    Args:
+        seed (Seed): Integer seed, seed sequence, or None for fresh entropy.
+
+    Returns:
+        SeedSequence: Seed sequence of the seed.
+    """
+    if isinstance(seed, SeedSequence):
+        return seed
+    return SeedSequence(seed)
+
+
+@beartype
+def child_seed(seed: Seed, *path: int) -> SeedSequence:
+    """Return the seed sequence at a path below a seed.
+
+    This is the child SeedSequence.spawn would create at those indices, but
+    it doesn't depend on how many children were spawned before, so a trial
+    gets the same stream whichever process runs it.
+
+    Args:
+        seed (Seed): Parent seed.
+        path (int): Child indices, e.g. (experiment, trial).
+
+    Returns:
+        SeedSequence: Seed sequence of the child.
+    """
+    parent = seed_sequence(seed)
+    return SeedSequence(
+        parent.entropy,
+        spawn_key=tuple(parent.spawn_key) + path,
+        pool_size=parent.pool_size,
+    )
 
 
 class RandomGenerator(object):
     """Base class with rng functionality."""
 
-    seed: int
+    seed: Seed
+    seed_seq: SeedSequence
     rng: Generator
 
     @beartype
-    def __init__(self, seed: int = 0):
+    def __init__(self, seed: Seed = None):
         """Initialize the random number generator.
 
         Args:
-            seed (int): [description]. Defaults to False.
+            seed (Seed): Integer seed or seed sequence. Defaults to None,
+                which draws fresh entropy.
         """
-        if seed:
-            self.rng = default_rng(seed)
-        else:
-            self.rng = default_rng()
         self.seed = seed
+        self.seed_seq = seed_sequence(seed)
+        self.rng = default_rng(self.seed_seq)
+
+    @beartype
+    def spawn_rngs(self, num: int) -> list[Generator]:
+        """Return independent generators, e.g. one per tile or worker.
+
+        Args:
+            num (int): Number of generators.
+
+        Returns:
+            List[Generator]: Generators seeded below this generator's seed.
+        """
+        return [
+            default_rng(child_seed(self.seed_seq, idx)) for idx in range(num)
+        ]
@@ -1,13 +1,77 @@
 """Module for running traffic simluation."""
 
+import asyncio
+import inspect
+from typing import AsyncIterator, Iterator, Optional
+
 import numpy as np
-import seaborn as sns
 from beartype import beartype
-from matplotlib import pyplot as plt
 
 from traffic_sim.core.matrix.traffic import TrafficMatrix
-from traffic_sim.core.sim.display import img_from_fig, save_gif
+from traffic_sim.core.metrics import TrafficMetrics
 from traffic_sim.core.sim.history import TrafficHistory
+from traffic_sim.core.sim.stream import (
+    EpochConsumer,
+    FrameRenderer,
+    HistoryRecorder,
+)
+
+
+async def consume_epoch(
+    consumer: EpochConsumer,
+    state: dict,
+    stop: asyncio.Event,
+) -> Optional[Exception]:
+    """Pass an epoch to a consumer, setting stop if it asks to stop.
+
+    Args:
+        consumer (EpochConsumer): Consumer of the epoch.
+        state (dict): Epoch index, traffic flows and volume matrix.
+        stop (asyncio.Event): Set when the consumer requests to stop.
+
+    Returns:
+        Optional[Exception]: The error raised by the consumer, which also
+        stops the simulation.
+    """
+    try:
+        res = consumer.consume(**state)
+        if inspect.isawaitable(res):
+            res = await res
+    except Exception as exc:
+        stop.set()
+        return exc
+    if res:
+        stop.set()
+    return None
+
+
+async def drain(
+    consumer: EpochConsumer,
+    queue: asyncio.Queue,
+    stop: asyncio.Event,
+) -> None:
+    """Pass the epochs of a queue to a consumer until None is queued.
+
+    After an error the queue is still drained so the producer never
+    blocks, and the error is raised once the consumer is closed.
+
+    Args:
+        consumer (EpochConsumer): Consumer of the epochs.
+        queue (asyncio.Queue): Queue of epochs, ended by None.
+        stop (asyncio.Event): Set when the consumer requests to stop.
+
+    Raises:
+        error: The first error raised by the consumer.
+    """
+    error = None
+    state = await queue.get()
+    while state is not None:
+        if error is None:
+            error = await consume_epoch(consumer, state, stop)
+        state = await queue.get()
+    consumer.close()
+    if error is not None:
+        raise error
 
 
 class TrafficSim(object):
@@ -25,17 +89,144 @@ class TrafficSim(object):
         """
         self.tm = matrix
 
+    def enable_metrics(self) -> TrafficMetrics:
+        """Record KPIs of the traffic matrix while it steps.
+
+        Returns:
+            TrafficMetrics: Metrics updated by every following epoch.
+        """
+        if self.tm.metrics is None:
+            self.tm.metrics = TrafficMetrics()
+        return self.tm.metrics
+
     @beartype
     def run(self, iterations: int) -> None:
         """Run the traffic simulation.
 
         Args:
             iterations (int): Number of iterations to run.
+
+        Raises:
+            ValueError: If the matrix recycles flows, since the history
+                would hold flows reused by later epochs.
         """
+        if self.tm.recycle:
+            raise ValueError(
+                'Recycled flows are only valid for one epoch, disable '
+                'recycle or stream the epochs to a consumer instead.',
+            )
         self.history = TrafficHistory()
-        for _ in range(iterations):
+        self.stream(iterations, [HistoryRecorder(self.history)])
+
+    @beartype
+    def iter_steps(self, iterations: int) -> Iterator[dict]:
+        """Step the traffic simulation lazily.
+
+        Nothing is retained between epochs, so the caller decides what to
+        keep.
+
+        Args:
+            iterations (int): Number of iterations to run.
+
+        Yields:
+            dict: Epoch index, traffic flows and volume matrix of each epoch.
+        """
+        for epoch in range(iterations):
             self.tm.step()
-            self.history.append(flows=self.tm.flows, volume=self.tm.vmatrix)
+            yield {
+                'epoch': epoch,
+                'flows': self.tm.flows,
+                'volume': self.tm.vmatrix,
+            }
+
+    async def aiter_steps(self, iterations: int) -> AsyncIterator[dict]:
+        """Step the traffic simulation lazily, yielding to the event loop.
+
+        Args:
+            iterations (int): Number of iterations to run.
+
+        Yields:
+            dict: Epoch index, traffic flows and volume matrix of each epoch.
+        """
+        for state in self.iter_steps(iterations):
+            yield state
+            await asyncio.sleep(0)
+
+    @beartype
+    def stream(
+        self,
+        iterations: int,
+        consumers: list[EpochConsumer],
+    ) -> int:
+        """Run the traffic simulation, passing every epoch to the consumers.
+
+        Args:
+            iterations (int): Number of iterations to run.
+            consumers (List[EpochConsumer]): Consumers of each epoch.
+
+        Returns:
+            int: Number of epochs run, less than `iterations` when a
+            consumer requested to stop.
+        """
+        epochs = 0
+        try:
+            for state in self.iter_steps(iterations):
+                epochs += 1
+                stop = [consumer.consume(**state) for consumer in consumers]
+                if any(stop):
+                    break
+        finally:
+            for consumer in consumers:
+                consumer.close()
+        return epochs
+
+    async def astream(
+        self,
+        iterations: int,
+        consumers: list[EpochConsumer],
+        maxsize: int = 1,
+    ) -> int:
+        """Run the traffic simulation with every consumer in its own task.
+
+        Each consumer reads from a queue of at most `maxsize` epochs. The
+        simulation waits for the slowest consumer once its queue is full,
+        so at most `maxsize` epochs are buffered per consumer. Consumers
+        may return an awaitable from `consume`.
+
+        Stopping is checked once an epoch is queued for every consumer, so
+        no epoch is stepped after a stop is seen. Consumers run behind the
+        simulation though, and the epochs already buffered when one asks
+        to stop, at most `maxsize` plus the one being queued, are still
+        passed to every consumer and counted.
+
+        Args:
+            iterations (int): Number of iterations to run.
+            consumers (List[EpochConsumer]): Consumers of each epoch.
+            maxsize (int): Number of epochs buffered per consumer.
+
+        Returns:
+            int: Number of epochs run, less than `iterations` when a
+            consumer requested to stop.
+        """
+        queues = [asyncio.Queue(maxsize) for _ in consumers]
+        stop = asyncio.Event()
+        tasks = [
+            asyncio.ensure_future(drain(consumer, queue, stop))
+            for consumer, queue in zip(consumers, queues)
+        ]
+        epochs = 0
+        try:
+            async for state in self.aiter_steps(iterations):
+                epochs += 1
+                for queue in queues:
+                    await queue.put(state)
+                if stop.is_set():
+                    break
+        finally:
+            for queue in queues:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+        return epochs
 
     @beartype
     def savefig(self, path: str) -> None:
@@ -44,17 +235,7 @@ class TrafficSim(object):
         Args:
             path (str): Path to save the .gif file.
         """
-        images = []
-        for _, history in enumerate(self.history):
-            # add heatmap to plot context (return value isn't used)
-            plt.clf()
-            sns.heatmap(
-                history['volume'],
-                cmap='YlGnBu',
-                linewidth=0.5,
-                vmin=0,
-                vmax=np.max(self.tm.cmatrix),
-            )
-            im = img_from_fig()
-            images.append(im)
-        save_gif(images, path)
+        renderer = FrameRenderer(path, int(np.max(self.tm.cmatrix)))
+        for epoch, history in enumerate(self.history):
+            renderer.consume(epoch, **history)
+        renderer.close()
@@ -0,0 +1,246 @@
+"""Module for consuming simulation epochs as they are produced."""
+
+from pathlib import Path
+
+import numpy as np
+import seaborn as sns
+from beartype import beartype
+from matplotlib import pyplot as plt
+from PIL import Image
+
+from traffic_sim.core.flow.flow import TrafficFlow
+from traffic_sim.core.matrix.base import full_mask
+from traffic_sim.core.sim.display import img_from_fig, save_gif
+from traffic_sim.core.sim.history import TrafficHistory
+
+
+@beartype
+def full_cells(cmatrix: np.ndarray, vmatrix: np.ndarray) -> int:
+    """Return the number of full cells in a volume matrix, see full_mask.
+
+    Args:
+        cmatrix (np.ndarray): Capacity matrix to compare to.
+        vmatrix (np.ndarray): Volume matrix to count full cells in.
+
+    Returns:
+        int: Number of full cells.
+    """
+    return int(np.count_nonzero(full_mask(cmatrix, vmatrix)))
+
+
+class EpochConsumer(object):
+    """Base class for consumers of simulation epochs.
+
+    A consumer sees every epoch once, in order, and must not keep a
+    reference to the flows or volume unless it needs them after the epoch.
+    """
+
+    def consume(
+        self,
+        epoch: int,
+        flows: list[TrafficFlow],
+        volume: np.ndarray,
+    ) -> bool:
+        """Process a single epoch.
+
+        Args:
+            epoch (int): Index of the epoch.
+            flows (List[TrafficFlow]): Traffic flows after the epoch.
+            volume (np.ndarray): Traffic volume matrix after the epoch.
+
+        Returns:
+            bool: True to request the simulation to stop early.
+        """
+        return False
+
+    def close(self) -> None:
+        """Finish consuming after the last epoch."""
+
+
+class HistoryRecorder(EpochConsumer):
+    """Consumer that stores every epoch in a TrafficHistory."""
+
+    history: TrafficHistory
+
+    @beartype
+    def __init__(self, history: TrafficHistory) -> None:
+        """Initialize history recorder.
+
+        Args:
+            history (TrafficHistory): History to append epochs to.
+        """
+        self.history = history
+
+    def consume(self, epoch, flows, volume):
+        """Append the epoch to the history.
+
+        The flow list is copied, since the matrix may change it in place.
+
+        Args:
+            epoch (int): Index of the epoch.
+            flows (List[TrafficFlow]): Traffic flows after the epoch.
+            volume (np.ndarray): Traffic volume matrix after the epoch.
+
+        Returns:
+            bool: Always False.
+        """
+        self.history.append(flows=list(flows), volume=volume)
+        return False
+
+
+class FullCellsCounter(EpochConsumer):
+    """Consumer that counts full cells over every epoch.
+
+    The volume of each epoch is the per-cell volume of the matrix's flow
+    index, so counting doesn't go through the flows again.
+    """
+
+    cmatrix: np.ndarray
+    count: int
+
+    @beartype
+    def __init__(self, cmatrix: np.ndarray) -> None:
+        """Initialize full cells counter.
+
+        Args:
+            cmatrix (np.ndarray): Capacity matrix to compare to.
+        """
+        self.cmatrix = cmatrix
+        self.count = 0
+
+    def consume(self, epoch, flows, volume):
+        """Add the full cells of the epoch to the count.
+
+        Args:
+            epoch (int): Index of the epoch.
+            flows (List[TrafficFlow]): Traffic flows after the epoch.
+            volume (np.ndarray): Traffic volume matrix after the epoch.
+
+        Returns:
+            bool: Always False.
+        """
+        self.count += full_cells(self.cmatrix, volume)
+        return False
+
+
+class FrameRenderer(EpochConsumer):
+    """Consumer that renders a heatmap per epoch and saves them as a gif."""
+
+    path: str
+    vmax: int
+    images: list[Image.Image]
+
+    @beartype
+    def __init__(self, path: str, vmax: int) -> None:
+        """Initialize frame renderer.
+
+        Args:
+            path (str): Path to save the .gif file.
+            vmax (int): Upper bound of the heatmap color scale.
+        """
+        self.path = path
+        self.vmax = vmax
+        self.images = []
+
+    def consume(self, epoch, flows, volume):
+        """Render the volume matrix of the epoch.
+
+        Args:
+            epoch (int): Index of the epoch.
+            flows (List[TrafficFlow]): Traffic flows after the epoch.
+            volume (np.ndarray): Traffic volume matrix after the epoch.
+
+        Returns:
+            bool: Always False.
+        """
+        plt.clf()
+        sns.heatmap(
+            volume,
+            cmap='YlGnBu',
+            linewidth=0.5,
+            vmin=0,
+            vmax=self.vmax,
+        )
+        self.images.append(img_from_fig())
+        return False
+
+    def close(self) -> None:
+        """Save the rendered frames."""
+        if self.images:
+            save_gif(self.images, self.path)
+
+
+class VolumeWriter(EpochConsumer):
+    """Consumer that appends every volume matrix to a .npy file.
+
+    The frames can be read back by calling np.load repeatedly on the open
+    file until it is exhausted.
+    """
+
+    path: Path
+
+    @beartype
+    def __init__(self, path: str) -> None:
+        """Initialize volume writer.
+
+        Args:
+            path (str): Path of the file to write to.
+        """
+        self.path = Path(path)
+        self._file = self.path.open('wb')
+
+    def consume(self, epoch, flows, volume):
+        """Write the volume matrix of the epoch.
+
+        Args:
+            epoch (int): Index of the epoch.
+            flows (List[TrafficFlow]): Traffic flows after the epoch.
+            volume (np.ndarray): Traffic volume matrix after the epoch.
+
+        Returns:
+            bool: Always False.
+        """
+        np.save(self._file, volume)
+        return False
+
+    def close(self) -> None:
+        """Close the file."""
+        self._file.close()
+
+
+class ConvergenceChecker(EpochConsumer):
+    """Consumer that stops the simulation once the volume stops changing."""
+
+    patience: int
+    converged: bool
+
+    @beartype
+    def __init__(self, patience: int = 3) -> None:
+        """Initialize convergence checker.
+
+        Args:
+            patience (int): Number of unchanged epochs before stopping.
+        """
+        self.patience = patience
+        self.converged = False
+        self._prev = None
+        self._unchanged = 0
+
+    def consume(self, epoch, flows, volume):
+        """Compare the volume matrix to the previous epoch.
+
+        Args:
+            epoch (int): Index of the epoch.
+            flows (List[TrafficFlow]): Traffic flows after the epoch.
+            volume (np.ndarray): Traffic volume matrix after the epoch.
+
+        Returns:
+            bool: True when the volume was unchanged for `patience` epochs.
+        """
+        if self._prev is not None and np.array_equal(self._prev, volume):
+            self._unchanged += 1
+        else:
+            self._unchanged = 0
+        self._prev = volume
+        self.converged = self._unchanged >= self.patience
+        return self.converged
@@ -0,0 +1,293 @@
+"""Telemetry module for reporting progress of long sweeps."""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from beartype import beartype
+from rich.progress import (
+    BarColumn,
+    Progress,
+    ProgressColumn,
+    TextColumn,
+    TimeRemainingColumn,
+)
+from rich.text import Text
+
+from traffic_sim.console import console
+
+# verbosity levels
+QUIET = 0
+PROGRESS = 1
+VERBOSE = 2
+
+
+class Telemetry(object):
+    """Base telemetry that reports nothing.
+
+    Events have a level and are only reported when the verbosity is at
+    least that level.
+    """
+
+    verbosity: int
+
+    @beartype
+    def __init__(self, verbosity: int = PROGRESS) -> None:
+        """Initialize telemetry.
+
+        Args:
+            verbosity (int): One of QUIET, PROGRESS or VERBOSE.
+        """
+        self.verbosity = verbosity
+
+    @beartype
+    def enabled(self, level: int) -> bool:
+        """Return whether events of a level are reported.
+
+        Args:
+            level (int): Verbosity needed to report an event.
+
+        Returns:
+            bool: True if the verbosity is at least the level.
+        """
+        return level <= self.verbosity
+
+    @beartype
+    def start(self, total: Optional[int] = None) -> None:
+        """Start tracking progress.
+
+        Args:
+            total (Optional[int]): Number of trials, None if unknown.
+        """
+
+    @beartype
+    def advance(self, num: int = 1) -> None:
+        """Mark trials as done.
+
+        Args:
+            num (int): Number of trials done.
+        """
+
+    def log(self, event: str, level: int = VERBOSE, **fields) -> None:
+        """Report an event.
+
+        Args:
+            event (str): Name of the event.
+            level (int): Verbosity needed to report the event.
+            fields: Values describing the event.
+        """
+
+    def close(self) -> None:
+        """Stop tracking progress."""
+
+
+class RateColumn(ProgressColumn):
+    """Progress column showing trials per second."""
+
+    def render(self, task) -> Text:
+        """Render the speed of a task.
+
+        Args:
+            task: Progress task.
+
+        Returns:
+            Text: Trials per second.
+        """
+        return Text('{0:.1f} trials/s'.format(task.speed or 0))
+
+
+class RichTelemetry(Telemetry):
+    """Telemetry with a rich progress bar redrawn a few times per second."""
+
+    refresh_per_second: float
+
+    @beartype
+    def __init__(
+        self,
+        verbosity: int = PROGRESS,
+        refresh_per_second: float = 2,
+    ) -> None:
+        """Initialize rich telemetry.
+
+        Args:
+            verbosity (int): One of QUIET, PROGRESS or VERBOSE.
+            refresh_per_second (float): Redraws of the progress bar.
+        """
+        super().__init__(verbosity)
+        self.refresh_per_second = refresh_per_second
+        self._progress = None
+        self._task = None
+
+    def start(self, total=None):
+        """Start the progress bar.
+
+        Args:
+            total (Optional[int]): Number of trials, None if unknown.
+        """
+        if not self.enabled(PROGRESS):
+            return
+        count = '{task.completed}'
+        if total is not None:
+            count = '{task.completed}/{task.total}'
+        self._progress = Progress(
+            TextColumn('{task.description}'),
+            BarColumn(),
+            TextColumn(count),
+            RateColumn(),
+            TimeRemainingColumn(),
+            console=console,
+            refresh_per_second=self.refresh_per_second,
+        )
+        self._progress.start()
+        self._task = self._progress.add_task('trials', total=total)
+
+    def advance(self, num=1):
+        """Advance the progress bar.
+
+        Args:
+            num (int): Number of trials done.
+        """
+        if self._task is not None:
+            self._progress.advance(self._task, num)
+
+    def log(self, event, level=VERBOSE, **fields):
+        """Print an event above the progress bar.
+
+        Args:
+            event (str): Name of the event.
+            level (int): Verbosity needed to report the event.
+            fields: Values describing the event.
+        """
+        if not self.enabled(level):
+            return
+        pairs = ' '.join(
+            '{0}={1}'.format(key, value) for key, value in fields.items()
+        )
+        console.print('{0} {1}'.format(event, pairs))
+
+    def close(self):
+        """Stop the progress bar."""
+        if self._progress is not None:
+            self._progress.stop()
+            self._progress = None
+            self._task = None
+
+
+class JsonTelemetry(Telemetry):
+    """Telemetry writing JSON lines to a file.
+
+    Each process opens the file in append mode and writes whole lines, so
+    worker processes on any node can share one log without a shared
+    console. Progress is written at most once every `interval` seconds.
+    """
+
+    path: Path
+    interval: float
+
+    @beartype
+    def __init__(
+        self,
+        path: str,
+        verbosity: int = VERBOSE,
+        interval: float = 5.0,
+    ) -> None:
+        """Initialize JSON telemetry.
+
+        Args:
+            path (str): Path of the JSON lines file.
+            verbosity (int): One of QUIET, PROGRESS or VERBOSE.
+            interval (float): Seconds between progress events.
+        """
+        super().__init__(verbosity)
+        self.path = Path(path)
+        self.interval = interval
+        self._file = self.path.open('a', buffering=1)
+        self._total = None
+        self._done = 0
+        self._started = time.time()
+        self._reported = 0.0
+
+    def start(self, total=None):
+        """Start counting trials.
+
+        Args:
+            total (Optional[int]): Number of trials, None if unknown.
+        """
+        self._total = total
+        self._done = 0
+        self._started = time.time()
+        self.log('start', level=PROGRESS, total=total)
+
+    def advance(self, num=1):
+        """Count trials, writing a progress event when it is due.
+
+        Args:
+            num (int): Number of trials done.
+        """
+        self._done += num
+        now = time.time()
+        if now - self._reported >= self.interval:
+            self._reported = now
+            self.progress(now)
+
+    def progress(self, now: float) -> None:
+        """Write the progress, trials per second and ETA.
+
+        Args:
+            now (float): Current time.
+        """
+        rate = self._done / max(now - self._started, 1e-9)
+        eta = None
+        if self._total is not None and rate:
+            eta = (self._total - self._done) / rate
+        self.log(
+            'progress',
+            level=PROGRESS,
+            done=self._done,
+            total=self._total,
+            rate=rate,
+            eta=eta,
+        )
+
+    def log(self, event, level=VERBOSE, **fields):
+        """Write an event as one JSON line.
+
+        Args:
+            event (str): Name of the event.
+            level (int): Verbosity needed to report the event.
+            fields: Values describing the event.
+        """
+        if not self.enabled(level):
+            return
+        record = {'time': time.time(), 'pid': os.getpid(), 'event': event}
+        record.update(fields)
+        self._file.write(json.dumps(record, default=str) + '\n')
+
+    def close(self):
+        """Write the final progress and close the file."""
+        if self._file.closed:
+            return
+        self.progress(time.time())
+        self._file.close()
+
+
+@beartype
+def make_telemetry(
+    path: Optional[str] = None,
+    verbosity: Optional[int] = None,
+) -> Telemetry:
+    """Return JSON telemetry if a path is given, else a progress bar.
+
+    Args:
+        path (Optional[str]): Path of a JSON lines file.
+        verbosity (Optional[int]): Verbosity, None for the default.
+
+    Returns:
+        Telemetry: Telemetry to report with.
+    """
+    kwargs = {} if verbosity is None else {'verbosity': verbosity}
+    if path is None:
+        return RichTelemetry(**kwargs)
+    return JsonTelemetry(path, **kwargs)
@@ -0,0 +1,7 @@
+"""Expose core.demand module."""
+
+from traffic_sim.core.demand import (
+    DemandSource,
+    demand_records,
+    save_demand,
+)
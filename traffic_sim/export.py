@@ -0,0 +1,10 @@
+"""Expose core.export module."""
+
+from traffic_sim.core.export import (
+    ArrowWriter,
+    load_table,
+    save_frame,
+    save_history,
+    save_table,
+    volume_frames,
+)
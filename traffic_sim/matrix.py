@@ -1,4 +1,6 @@
 """Expose core.matrix module."""
 
+from traffic_sim.core.matrix.directed import DirectedMatrix
+from traffic_sim.core.matrix.layout import RoadLayout
 from traffic_sim.core.matrix.traffic import TrafficMatrix
 from traffic_sim.core.matrix.weighted import WeightedMatrix
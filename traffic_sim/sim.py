@@ -1,3 +1,11 @@
 """Expose core.sim module."""
 
 from traffic_sim.core.sim.sim import TrafficSim
+from traffic_sim.core.sim.stream import (
+    ConvergenceChecker,
+    EpochConsumer,
+    FrameRenderer,
+    FullCellsCounter,
+    HistoryRecorder,
+    VolumeWriter,
+)